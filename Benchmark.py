@@ -0,0 +1,375 @@
+from contextlib import redirect_stdout
+from json import dump, dumps, load
+from os import devnull, makedirs, path, remove, scandir
+from os.path import isdir, isfile, join
+from platform import platform, python_version
+from re import match, search
+from sys import exit as sys_exit, argv
+from tempfile import gettempdir
+from time import perf_counter, strftime
+from typing import Dict, List, Optional, Tuple
+
+from pexpect import popen_spawn
+
+import GeneratorMain as generator
+
+try:
+    # Used to read the peak memory usage, not available on Windows.
+    import resource
+except ImportError:
+    resource = None
+
+# Directory in which the fixtures are generated. The fixtures are generated only once and reused by
+# the runs that follow, can be set with `--fixtures=DIR`.
+fixtures_root: str = join(gettempdir(), 'flac-generator-benchmark')
+
+# Multiplier applied to the number of files, and to the duration of the long files, in each
+# fixture tree. Can be set with `--scale=FACTOR` - fixtures generated with a different scale are
+# kept in a directory of their own.
+fixture_scale: float = 1.0
+
+# Number of files converted at the same time, can be set with `--jobs=N`.
+jobs: int = generator.jobs
+
+# Number of times ffmpeg is started to measure the cost of spawning a process.
+spawn_count: int = 20
+
+
+def fixture_specs(scale: float) -> Dict[str, List[Tuple[str, str]]]:
+    """
+        Describes the fixture trees used by the benchmarks.
+
+        Remarks
+        --------
+        Every fixture is synthesized by ffmpeg (tones, noise and test patterns), nothing has to be
+        downloaded - the same fixtures can be generated on any machine.
+
+        Returns
+        --------
+        Dictionary mapping the name of each fixture tree to a list of tuples, each containing the
+        path of a file relative to the tree, and the ffmpeg arguments generating the file.
+    """
+
+    def count(value: int) -> int:
+        return max(1, int(value * scale))
+
+    specs: Dict[str, List[Tuple[str, str]]] = {
+        # Lots of tiny files, the cost of starting ffmpeg dominates.
+        'tiny_wav': [
+            (f'tiny_{i:04d}.wav', f'-f lavfi -i sine=f={220 + i % 880}:d=1 -c:a pcm_s16le')
+            for i in range(count(200))
+        ],
+
+        # A handful of long hi-res files, the encoder dominates.
+        'long_wav': [
+            (f'long_{i}.wav', f'-f lavfi -i anoisesrc=d={count(300)}:r=96000:seed={i + 1} -ac 2 '
+                              f'-c:a pcm_s24le')
+            for i in range(3)
+        ],
+
+        # Lossy sources, the decoder has some work to do as well.
+        'lossy': [
+            (f'lossy_mp3_{i:02d}.mp3', f'-f lavfi -i sine=f={300 + i * 20}:d=30 -c:a libmp3lame')
+            for i in range(count(10))
+        ] + [
+            (f'lossy_aac_{i:02d}.m4a', f'-f lavfi -i sine=f={300 + i * 20}:d=30 -c:a aac')
+            for i in range(count(10))
+        ],
+
+        # Video containers with several audio tracks, only the audio is to be touched.
+        'video': [
+            (f'video_{i}.mkv', f'-f lavfi -i testsrc=d={count(60)}:s=320x240:r=10 '
+                               f'-f lavfi -i sine=f=300:d={count(60)} '
+                               f'-f lavfi -i sine=f=500:d={count(60)} '
+                               f'-f lavfi -i sine=f=700:d={count(60)} '
+                               f'-map 0 -map 1 -map 2 -map 3 -c:v mpeg4 -c:a aac')
+            for i in range(3)
+        ],
+
+        # Deeply nested directories with a couple of files at each level, stresses the scan.
+        'nested': [
+            (join(*[f'level_{depth}' for depth in range(level)], f'nested_{i}.mp3'),
+             f'-f lavfi -i sine=f={200 + level * 50}:d=1 -c:a libmp3lame')
+            for level in range(1, 13) for i in range(2)
+        ],
+    }
+
+    return specs
+
+
+def run_process(arguments: str) -> str:
+    """
+        Runs ffmpeg with the given arguments, waiting for it to exit.
+
+        Returns
+        --------
+        String containing everything written by ffmpeg.
+    """
+
+    thread = popen_spawn.PopenSpawn(f'{generator.process_name} -nostdin -hide_banner {arguments}')
+    output: str = thread.read().decode(errors='replace')
+    thread.wait()
+
+    return output
+
+
+def generate_fixtures(root_dir: str, specs: Dict[str, List[Tuple[str, str]]]) -> None:
+    """
+        Generates the fixture trees inside the root directory, skipping the files that exist.
+
+        Exceptions
+        -----------
+        RuntimeError: ffmpeg failed to generate a fixture.
+    """
+
+    for name, files in specs.items():
+        for relative_path, arguments in files:
+            file_path: str = join(root_dir, name, relative_path)
+            if isfile(file_path):
+                continue
+
+            makedirs(path.dirname(file_path), exist_ok=True)
+
+            # Writing to a temporary name first, an interrupted run should not leave a broken
+            # fixture behind.
+            partial: str = join(path.dirname(file_path), f'.partial.{path.basename(file_path)}')
+            output: str = run_process(f'-v error {arguments} -y "{partial}"')
+
+            if not isfile(partial):
+                raise RuntimeError(f'Failed to generate the fixture "{file_path}": {output}')
+
+            generator.replace(partial, file_path)
+
+
+def remove_outputs(root_dir: str) -> None:
+    """
+        Removes every flac file inside a directory (and its sub-directories), so that the next
+        conversion starts from scratch.
+    """
+
+    for entry in scandir(root_dir):
+        if entry.is_dir():
+            remove_outputs(entry.path)
+        elif entry.name.endswith('.flac'):
+            remove(entry.path)
+
+
+def measure_spawn() -> Dict[str, float]:
+    """
+        Measures the cost of starting an ffmpeg process that does nothing.
+
+        Returns
+        --------
+        Dictionary containing the mean and the lowest time (in seconds) taken by a process.
+    """
+
+    timings: List[float] = []
+    for _ in range(spawn_count):
+        start_time: float = perf_counter()
+        run_process('-version')
+        timings.append(perf_counter() - start_time)
+
+    return {'count': spawn_count, 'mean': sum(timings) / len(timings), 'min': min(timings)}
+
+
+def measure_tree(tree: str) -> Dict[str, float]:
+    """
+        Runs the benchmarks on a single fixture tree - scan, probe, and conversion.
+
+        Remarks
+        --------
+        The metadata cache is disabled while the benchmarks run, every probe fires ffmpeg. The
+        output of the script is discarded during the conversion.
+
+        Returns
+        --------
+        Dictionary containing the measurements, the times being in seconds.
+    """
+
+    start_time: float = perf_counter()
+    sources: List[str] = list(generator.scan_files(tree))
+    scan_time: float = perf_counter() - start_time
+
+    start_time = perf_counter()
+    for source in sources:
+        generator.probe_file(source)
+    probe_time: float = perf_counter() - start_time
+
+    remove_outputs(tree)
+
+    with open(devnull, 'w') as output, redirect_stdout(output):
+        start_time = perf_counter()
+        results: List[generator.ConversionResult] = generator.convert_files(
+            sources, overwrite=True, worker_count=jobs
+        )
+        encode_time: float = perf_counter() - start_time
+
+    remove_outputs(tree)
+
+    audio_seconds: float = sum(result.duration for result in results if result.success)
+
+    return {
+        'files': len(sources),
+        'failed': sum(1 for result in results if result.failed),
+        'scan_seconds': scan_time,
+        'probe_seconds': probe_time,
+        'probe_seconds_per_file': probe_time / max(len(sources), 1),
+        'encode_seconds': encode_time,
+        'audio_seconds': audio_seconds,
+        'audio_seconds_per_second': audio_seconds / max(encode_time, 1e-6),
+        'files_per_second': len(sources) / max(encode_time, 1e-6),
+    }
+
+
+def peak_rss() -> Optional[Dict[str, int]]:
+    """
+        Returns the peak resident set size (in kilobytes) of this process, and of the largest
+        child process (ffmpeg) - `None` if it can't be read on this platform.
+
+        Remarks
+        --------
+        On Linux, the peak of a child process can't be lower than the size of this process at the
+        time the child was started - the size carries over to the child until it replaces itself
+        with ffmpeg.
+    """
+
+    if resource is None:
+        return None
+
+    # macOS reports the size in bytes, every other platform in kilobytes.
+    divisor: int = 1024 if 'darwin' in platform().lower() else 1
+    return {
+        'self_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // divisor,
+        'children_kb': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // divisor,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """
+        Returns the commit checked out in the directory of this script, `None` if unknown.
+    """
+
+    try:
+        thread = popen_spawn.PopenSpawn('git rev-parse HEAD', cwd=path.dirname(path.abspath(__file__)))
+        commit = search(r'[0-9a-f]{40}', thread.read().decode(errors='replace'))
+        thread.wait()
+    except Exception:
+        return None
+
+    return commit.group(0) if commit else None
+
+
+def run_benchmarks() -> Dict:
+    """
+        Generates the fixtures (if needed) and runs every benchmark.
+
+        Returns
+        --------
+        Dictionary containing the report, ready to be saved as JSON.
+    """
+
+    root_dir: str = join(fixtures_root, f'scale-{fixture_scale:g}')
+    specs: Dict[str, List[Tuple[str, str]]] = fixture_specs(fixture_scale)
+
+    print(f'Generating the fixtures inside "{root_dir}"')
+    generate_fixtures(root_dir, specs)
+
+    # Every probe should fire ffmpeg, and the cache of the user should be left alone.
+    generator.metadata_cache = ''
+
+    report: Dict = {
+        'commit': git_commit(),
+        'time': strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': python_version(),
+        'platform': platform(),
+        'ffmpeg': (search(r'ffmpeg version (\S+)', run_process('-version')) or [None, None])[1],
+        'settings': {'scale': fixture_scale, 'jobs': jobs},
+    }
+
+    print('Measuring the cost of starting ffmpeg')
+    report['spawn'] = measure_spawn()
+
+    start_time: float = perf_counter()
+    file_count: int = sum(1 for _ in generator.scan_files(root_dir))
+    report['scan'] = {'files': file_count, 'seconds': perf_counter() - start_time}
+
+    report['trees'] = {}
+    for name in specs:
+        print(f'Benchmarking the `{name}` fixtures')
+        report['trees'][name] = measure_tree(join(root_dir, name))
+
+    report['peak_rss'] = peak_rss()
+    return report
+
+
+def compare_reports(baseline: Dict, report: Dict) -> None:
+    """
+        Prints each measurement of the report along with the change since the baseline report.
+    """
+
+    def numbers(values: Dict, prefix: str = '') -> Dict[str, float]:
+        # Flattens the (nested) measurements into a single level, e.g. `trees.tiny_wav.files`.
+        flat: Dict[str, float] = {}
+        for key, value in (values or {}).items():
+            if isinstance(value, dict):
+                flat.update(numbers(value, f'{prefix}{key}.'))
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                flat[f'{prefix}{key}'] = value
+        return flat
+
+    old, new = numbers(baseline), numbers(report)
+
+    print(f'\nComparing with {baseline.get("commit") or "the baseline"}:')
+    for key in new:
+        if key.startswith('settings.') or key not in old:
+            continue
+
+        change: str = f'{(new[key] - old[key]) / old[key] * 100:+.1f}%' if old[key] else 'n/a'
+        print(f'\t{key:<45} {old[key]:>12.4g} -> {new[key]:<12.4g} ({change})')
+
+
+if __name__ == '__main__':
+    output_file: Optional[str] = None
+    baseline_file: Optional[str] = None
+
+    pattern_fixtures = r'^--fixtures="?(.*?)"?$'
+    pattern_scale = r'^--scale=([0-9]+(?:\.[0-9]+)?)$'
+    pattern_jobs = r'^--jobs=([0-9]+)$'
+    pattern_output = r'^--output="?(.*?)"?$'
+    pattern_compare = r'^--compare="?(.*?)"?$'
+
+    # Skipping the first parameter since it is the name of the script, and not an argument.
+    for argument in argv[1:]:
+        if match(pattern_fixtures, argument):
+            fixtures_root = search(pattern_fixtures, argument).groups()[0]
+        elif match(pattern_scale, argument):
+            fixture_scale = float(search(pattern_scale, argument).groups()[0])
+        elif match(pattern_jobs, argument):
+            jobs = max(int(search(pattern_jobs, argument).groups()[0]), 1)
+        elif match(pattern_output, argument):
+            output_file = search(pattern_output, argument).groups()[0]
+        elif match(pattern_compare, argument):
+            baseline_file = search(pattern_compare, argument).groups()[0]
+
+            if not isfile(baseline_file):
+                print(f'No report found at the path "{baseline_file}"')
+                sys_exit(1)
+        else:
+            print(f'Unexpected argument `{argument}`')
+            sys_exit(1)
+
+    if not isdir(fixtures_root):
+        makedirs(fixtures_root)
+
+    result: Dict = run_benchmarks()
+
+    if output_file:
+        with open(output_file, 'w', encoding='utf-8') as file:
+            dump(result, file, indent=2)
+        print(f'\nSaved the report to "{output_file}"')
+    else:
+        print(dumps(result, indent=2))
+
+    if baseline_file:
+        with open(baseline_file, 'r', encoding='utf-8') as file:
+            compare_reports(load(file), result)
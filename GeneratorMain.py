@@ -1,16 +1,58 @@
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext, redirect_stdout
+from contextvars import ContextVar, copy_context
+from csv import DictWriter
+from hashlib import sha256
+from heapq import heappop, heappush
+from json import dump, dumps, load, loads
 from math import ceil
-from os import getcwd, listdir, path
-from os.path import isdir, isfile, join
+from mmap import ACCESS_READ, mmap
+from os import O_CREAT, O_EXCL, O_WRONLY, close as os_close, cpu_count, fdopen, getcwd, getpid, \
+    link, makedirs, open as os_open, path, remove, rename, replace, scandir, stat, utime
+from os.path import isdir, isfile, join, relpath
 from platform import system
-from re import search, match
-from sys import exit as sys_exit, argv
-from threading import Thread
-from time import sleep, time
-from typing import List, Tuple, Optional, Union
+from re import findall, search, match
+from shutil import copyfile, get_terminal_size
+from socket import gethostname
+from sqlite3 import Connection, DatabaseError, connect
+from sys import exit as sys_exit, argv, stdin
+from threading import Event, Lock, Semaphore, Thread
+from time import perf_counter, sleep, time, time_ns
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Set, TextIO, Tuple, \
+    Optional, Union
+
+import sys
 
 import pexpect
 from pexpect import popen_spawn
 
+try:
+    # Optional, used to encode PCM wav files without firing ffmpeg. ffmpeg is used for all the files
+    # if the library is not installed.
+    import soundfile
+except ImportError:
+    soundfile = None
+
+try:
+    # Used to sample the load of the system while adapting the number of workers, Unix only.
+    from os import getloadavg
+except ImportError:
+    getloadavg = None
+
+try:
+    # Used to clone files (reflinks) on the file systems supporting it, Unix only.
+    from fcntl import ioctl
+except ImportError:
+    ioctl = None
+
+try:
+    # Optional, used by the watch mode to be notified of new files (Linux only). The directories are
+    # polled for changes if the library is not installed.
+    from inotify_simple import INotify, flags as inotify_flags
+except ImportError:
+    INotify = None
+
 # File extensions supported. Any file having an extension outside of these will be ignored.
 # Extensions can be added as needed. Adding incorrect extension will result in an error from ffmpeg.
 audio_files = ['wav', 'mp3', 'm4a']
@@ -24,6 +66,12 @@ ignore_dir: str = '.ignore'
 # Total number of bars (hashes by default) present in the progress bar.
 progress_bar_count: int = 20
 
+# Interval (in seconds) at which the dashboard is redrawn while multiple files are converted at the
+# same time - and the interval at which a progress line is printed instead, if the output is not a
+# terminal (or in batch mode).
+dashboard_refresh_interval: float = 0.25
+dashboard_log_interval: float = 30
+
 # Symbol used to generate the progress bar. Max length of 4 characters.
 #
 # WARNING: Setting this symbol to be anything other than a blank string will replace
@@ -33,6 +81,236 @@ symbol: str = ''
 # List containing full paths of all the files to be processed.
 files = list()
 
+# Dashboard showing the progress of the conversions, `None` unless multiple files are converted at
+# the same time - see `ProgressBoard`.
+dashboard: Optional['ProgressBoard'] = None
+
+# Number of files to be converted at the same time. Each conversion runs inside its own ffmpeg
+# process, the FLAC encoder being single-threaded this is the number of cores put to use.
+# Defaults to the number of CPUs available, can be overridden with `--jobs=N`.
+jobs: int = cpu_count() or 1
+
+# Lower bound on the number of files converted at the same time - if set, the number of workers is
+# adapted to the load of the system, between this and `jobs` (see `ConcurrencyController`). Zero
+# keeps the number of workers fixed, can be set with `--jobs=MIN-MAX`.
+min_jobs: int = 0
+
+# Interval (in seconds) at which the number of workers is reconsidered, and the number of intervals
+# a decision sticks for once an extra worker turned out not to help (or the system was overloaded).
+adaptive_interval: float = 10
+adaptive_cooldown: int = 6
+
+# Load average (per core) above which a worker is removed, and below which a worker can be added.
+adaptive_max_load: float = 1.0
+adaptive_target_load: float = 0.9
+
+# Fraction of the memory that should remain available, a worker is removed below this.
+adaptive_min_memory: float = 0.1
+
+# Share of the time (in percent, over the last 10 seconds) tasks spent waiting on the disks, above
+# which no worker is added - see `/proc/pressure/io`.
+adaptive_max_io_pressure: float = 20
+
+# Fraction by which the overall speed should improve after adding a worker, the worker is removed
+# again otherwise.
+adaptive_min_gain: float = 0.05
+
+# Audio track(s) to be extracted from video files (any file with an extension in `video_files`).
+# Video, subtitle and data streams are never processed, only the audio is read from the container.
+#
+# Allowed values:
+#   'default' - The audio track picked by ffmpeg (the one with the most channels).
+#   'all'     - Each audio track is written to its own file, named `<name>.track<N>.flac`.
+#   '<N>'     - The N-th audio track (counting from zero), for instance '1' for the second track.
+#   '<lang>'  - The first audio track in the given language, for instance 'eng' or 'jpn'.
+#
+# Can be overridden with `--audio-track=<value>`.
+audio_tracks: str = 'default'
+
+# Duration (in seconds) beyond which a file is split into segments that are encoded at the same
+# time, one segment per idle worker - the segments are then joined into a single flac file. Speeds
+# up the conversion of very long files which would otherwise keep a single core busy. Only PCM
+# sources are segmented. Zero disables the segmented mode, can be set with `--segment=SECONDS`.
+segment_threshold: float = 0
+
+# Block size used by the encoder in segmented mode. Each segment (except the last one) contains a
+# multiple of this many samples, the frames of a FLAC file should all be of the same size.
+segment_block_size: int = 4608
+
+# Workers of `convert_files` that are not converting a file. Each job holds a worker while it runs
+# (see `convert_job`), the segmented mode borrows the idle ones to encode the segments of a file -
+# the number of ffmpeg processes never goes beyond the number of workers. None outside of
+# `convert_files`.
+idle_workers: Optional[Semaphore] = None
+
+# Extensions of the files that can be encoded in-process - without firing ffmpeg - if `soundfile`
+# is installed. Only 16 and 24 bit PCM files are encoded in-process, FLAC can't store any other
+# kind of wav file as-is (ffmpeg converts such files, and is used for them). Leaving this set
+# empty disables the in-process encoder, as does `--native=no`.
+native_files: Set[str] = {'wav'}
+
+# Number of samples (per channel) read from the source at a time by the in-process encoder.
+native_chunk_size: int = 1 << 18
+
+# Files shorter than this duration (in seconds) are grouped, each group being converted by a single
+# ffmpeg process - for very short files, starting ffmpeg takes longer than the conversion itself.
+# Zero disables grouping, can be set with `--group=SECONDS`. Only applies to audio files that are
+# not encoded in-process.
+group_threshold: float = 0
+
+# Maximum number of files in a group.
+group_size: int = 32
+
+# Amount of time (in seconds) an ffmpeg process can go without making progress before it is
+# considered stuck and killed - a slow read holds up a process for a while, a stuck process never
+# moves again. Zero disables the check, can be set with `--stall-timeout=SECONDS`.
+stall_timeout: float = 120
+
+# Interval (in seconds) at which a quiet ffmpeg process is checked for a stall.
+stall_check_interval: float = 1
+
+# Number of times the conversion of a stuck file is retried, and the delay (in seconds) before the
+# first retry - doubled for every retry that follows. A file that is stuck on every attempt is
+# quarantined, and listed separately in the summary. Can be set with `--retries=N` and
+# `--retry-backoff=SECONDS`.
+retry_count: int = 2
+retry_backoff: float = 5
+
+# Batch mode runs the script without any interaction - no prompts, no progress bar, no animation
+# at the end - and exits with a non-zero status if any file fails to convert. Enabled with
+# `--batch`, or when the input of the script is not a terminal (cron jobs, job runners, pipes).
+batch_mode: bool = False
+
+# Exit status of the script if a file fails to convert, and if the arguments are invalid.
+exit_status_failed: int = 1
+exit_status_usage: int = 2
+
+# Engine driving the conversions, can be set with `--engine=<engine>`. The `threads` engine waits on
+# each ffmpeg process from a worker thread, the `async` engine drives all of them from a single
+# event loop - see `convert_files_async`. Segmented encoding, groups of short files, the in-process
+# encoder and a range of jobs all rely on worker threads, and are not available with `async`.
+engine: str = 'threads'
+engines: List[str] = ['threads', 'async']
+
+# Maximum amount of time (in seconds) a single conversion can take with the `async` engine, the
+# conversion is cancelled once it runs for longer. Zero disables the limit, can be set with
+# `--timeout=SECONDS`.
+job_timeout: float = 0
+
+# Order in which the files are converted, can be set with `--schedule=<policy>`. Each policy is a
+# function that takes the estimated duration of a file and returns the key the files are sorted by,
+# `None` keeps the files in the order they are found - and converts them while the directory is
+# still being scanned. More policies can be added to `scheduling_policies`.
+#
+# The longest files are converted first by default. When the longest files are left for the end,
+# a handful of workers end up converting them while the rest sit idle.
+schedule_policy: str = 'longest'
+
+# Speed of the encoder (in audio-seconds converted per second, by a single worker) and the time
+# spent starting ffmpeg for a file (in seconds). Only used to predict the runtime of a batch.
+estimated_speed: float = 200.0
+estimated_overhead: float = 0.05
+
+# Rough amount of bytes per second of audio for compressed files, used to estimate the duration of
+# a file from its size. The duration of a wav file is read from its header.
+estimated_byte_rates: Dict[str, float] = {
+    'mp3': 256000 / 8,
+    'm4a': 256000 / 8,
+    'mp4': 2000000 / 8,
+    'mkv': 4000000 / 8
+}
+
+# Path of the SQLite database used to cache the details (duration, streams) of the files probed or
+# converted, shared across runs. The details of a file are used till the file is modified. A blank
+# string disables the cache, can be set with `--cache=<path>` (or `--cache=no`).
+metadata_cache: str = path.join(path.expanduser('~'), '.cache', 'flac-generator', 'metadata.db')
+
+# Connection to the metadata cache, opened on first use - along with the lock guarding it.
+metadata_database: Optional[Connection] = None
+metadata_lock: Lock = Lock()
+
+# Name of the manifest file - created inside the root directory - used to remember the files that
+# have already been converted. Only used if incremental mode is enabled with `--incremental`.
+manifest_name: str = '.flac-generator-manifest.json'
+
+# Sources whose flac file(s) - generated by an earlier run, as recorded in the manifest - are stale,
+# and are overwritten by the new conversion even without `--force`. The stale flac files are only
+# replaced once the new ones are complete (see `finalize_outputs`), a failed conversion leaves them
+# in place.
+stale_sources: Set[str] = set()
+
+# Time spent (in seconds) in each phase - probe, spawn, encode and write - of the conversion of
+# the file being converted, see `timed`. Each worker thread (or task, with the `async` engine) sees
+# the dictionary of the file it is converting, `None` outside a conversion.
+phase_times: ContextVar[Optional[Dict[str, float]]] = ContextVar('phase_times', default=None)
+
+# File to which a record is written for each file converted, as JSON Lines - or as CSV, if the name
+# ends with `.csv`. Can be set with `--report=FILE`, no report is written by default.
+report_file: str = ''
+
+# Name of the journal - created inside the root directory - to which the state of each file
+# (pending, running, done or failed) is appended as the batch moves along. A batch that is
+# interrupted can be picked up where it was left with `--resume`, the journal is removed once the
+# batch is over.
+journal_name: str = '.flac-generator-journal'
+
+# Journal of the batch being converted, `None` if it could not be created - along with the lock
+# guarding it.
+journal_file: Optional[TextIO] = None
+journal_lock: Lock = Lock()
+
+# Watch mode - once the files present are converted, the root directory is watched for new files,
+# converted as they land. Can be false (disabled), true (inotify if available, polling otherwise),
+# or 'poll' (always polling - inotify does not see the files written to a network share by other
+# machines). Can be set with `--watch`, `--watch=poll`.
+watch_mode: Union[bool, str] = False
+
+# Amount of time (in seconds) for which the size of a new file should not change before it is
+# converted - the file might still be being written (or copied) otherwise.
+watch_settle_time: float = 5
+
+# Interval (in seconds) at which the new files are checked for their size, and at which the
+# directories are checked for changes when polling.
+watch_poll_interval: float = 1
+
+# Name of the shared queue - several processes (on one or more machines) running with the same
+# queue on the same root directory split the files between them, each file is converted by a single
+# process. Blank disables the queue, can be set with `--shared` (queue named `default`) or
+# `--shared=NAME`. See `claim_source`.
+shared_queue: str = ''
+
+# Name of the directory - created inside the root directory - holding the state of each queue.
+queue_dir_name: str = '.flac-generator-queue'
+
+# Amount of time (in seconds) after which the lease on a file is considered abandoned (the process
+# holding it died), and the file can be claimed by another process. Leases held by a running process
+# are renewed every quarter of this. Can be set with `--lease-timeout=SECONDS`.
+lease_timeout: float = 120
+
+# Root directory and directory of the shared queue in use, blank if there is none - along with the
+# inode of the lease held on each file being converted, and the lock guarding these.
+queue_root: str = ''
+queue_directory: str = ''
+held_leases: Dict[str, int] = {}
+lease_lock: Lock = Lock()
+
+# Name identifying this process in the leases it holds.
+worker_name: str = f'{gethostname()}-{getpid()}'
+
+# Size of the chunks (in bytes) in which files are read while calculating their hash.
+hash_chunk_size: int = 1024 * 1024
+
+# Deduplication - sources with identical contents are converted once, the flac file(s) of the first
+# source being cloned for the others. Can be false (disabled), true (the flac files are reflinked if
+# the file system supports it, hardlinked otherwise, copied if neither is possible) or 'copy'
+# (reflinked or copied - a hardlinked flac file shares its tags with its clones). Can be set with
+# `--dedup`, `--dedup=copy`.
+dedup_mode: Union[bool, str] = False
+
+# Request code of the `ioctl` cloning a file on Linux (`FICLONE`), supported by btrfs, XFS and the
+# like - the clone shares its blocks with the original until either of them is modified.
+clone_request: int = 0x40049409
+
 # List containing strings that will be used as units of time - in reversed order.
 units: List[str] = [
     'weeks',
@@ -58,6 +336,70 @@ else:
     process_name = 'ffmpeg'
 
 
+def scan_files(root_dir: str, mode: str = 'recursive') -> Iterator[str]:
+    """
+        Generator yielding the full path of each file of a supported type present inside the given
+        directory, as soon as the file is found.
+
+        Parameters
+        -----------
+        root_dir:
+            A string containing the directory that is to be used as the root where
+            the files are to be searched in\n
+        mode:
+            A string indicating the mode that is to be used to select files in the given
+            directory. Default Value: 'recursive', Allowed Values: (recursive/direct)
+
+
+        Remarks
+        --------
+        Works the same way as `get_file_list` - the files present in a directory are yielded before
+        the ones present in its sub-directories, and directories named `ignore_dir` are skipped.
+
+        The type of each entry is taken from the directory listing itself (`scandir`), no separate
+        `stat` call is made to know if an entry is a file or a directory. The tree is walked using a
+        stack of directories rather than recursion, only the files of the directory being read are
+        held in memory at any moment.
+
+        Directories that can't be read (lack of permissions, removed mid-scan) are reported and
+        skipped, the scan carries on with the rest of the tree.
+
+        Exceptions
+        ------------
+        OSError.FileNotFoundError: Thrown if a directory at the location provided does not exist.
+    """
+
+    if not isdir(root_dir):
+        raise FileNotFoundError(f'The directory "{root_dir}" does not exist')
+
+    # Set lookups are cheaper than searching the lists for each file.
+    extensions: Set[str] = set(audio_files) | set(video_files)
+
+    # Directories that are yet to be scanned. The ones pushed last are scanned first, the same
+    # order as the recursive calls made by `get_file_list`.
+    directories: List[str] = [root_dir]
+
+    while directories:
+        directory: str = directories.pop()
+        children: List[str] = []
+
+        try:
+            with scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        if entry.name.rpartition('.')[-1] in extensions:
+                            yield join(directory, entry.name)
+                    elif mode == 'recursive' and entry.name != ignore_dir and entry.is_dir():
+                        children.append(join(directory, entry.name))
+        except OSError as error:
+            if directory == root_dir:
+                raise
+            print(f'\nSkipping directory "{directory}": {error.strerror}')
+
+        # Reversing the children, ensuring that the first one is at the top of the stack.
+        directories.extend(reversed(children))
+
+
 def get_file_list(root_dir: str, mode: str = 'recursive') -> List[str]:
     """
         Returns a list of strings, each of these strings contains the full path
@@ -82,6 +424,9 @@ def get_file_list(root_dir: str, mode: str = 'recursive') -> List[str]:
         Direct mode will simply select the files that are present in the root directory.
         Files present inside a child directory of the root directory will not be included.
 
+        The list is built using `scan_files`, which can be used directly to process the files
+        while the directory is still being scanned.
+
         Exceptions
         ------------
         OSError.FileNotFoundError: Thrown if a directory at the location provided does not exist.
@@ -94,37 +439,246 @@ def get_file_list(root_dir: str, mode: str = 'recursive') -> List[str]:
         list will also be returned by this method.
     """
 
-    if not isdir(root_dir):
-        raise FileNotFoundError(f'The directory "{root_dir}" does not exist')
+    files.extend(scan_files(root_dir, mode))
+    return files
+
+
+class DirectoryWatcher:
+    """
+        Watches a directory (and its sub-directories) for new files of a supported type.
+
+        Remarks
+        --------
+        The tree is scanned once while the watcher is created, every file found then is treated as
+        a new file. After that, only the directories that changed are read again - there is no
+        full scan of the tree, no matter how long the directory is watched for.
+
+        With inotify (see `INotify`), the kernel reports the files created in (or moved to) each
+        directory. Without it, each directory is checked (a `stat` call, the directory is not read)
+        every `watch_poll_interval` seconds, and read again only if its modification time changed.
+        Sub-directories created later on are watched (and scanned) as soon as they are found,
+        directories named `ignore_dir` are skipped either way.
 
-    items = listdir(root_dir)
-
-    for item in items:
-        # Appending all the files of the supported types to the list of files found.
-        item: str = join(root_dir, item)
-        ext: str = item.rpartition('.')[-1]
-        if isfile(item) and (ext in audio_files or ext in video_files):
-            files.append(item)
-
-    # Recursively running this function for each directory present in the root
-    # if the mode is recursive.
-    if mode == 'recursive':
-        for item in items:
-            if item == ignore_dir:
-                # If the name of any item is the same as the title of the directory
-                # that is to be ignored, then skipping the item.
-                # Since this loop is meant for directories only, even if the item
-                # is a file no harm is done by ignoring it.
+        A new file is only reported once its size has not changed for `watch_settle_time` seconds,
+        a file that is still being written (or copied) is never converted. Files whose flac file
+        exists already are left alone, unless these are being overwritten.
+
+        Parameters
+        -----------
+        root_dir: Full path of the directory to be watched \n
+        mode: Same as `scan_files`. Default --> 'recursive' \n
+        use_inotify: Boolean indicating if inotify is to be used, if available. Default --> true \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+
+        Exceptions
+        ------------
+        OSError.FileNotFoundError: Thrown if a directory at the location provided does not exist.
+    """
+
+    def __init__(self, root_dir: str, mode: str = 'recursive', *, use_inotify: bool = True,
+                 overwrite: bool = False) -> None:
+        if not isdir(root_dir):
+            raise FileNotFoundError(f'The directory "{root_dir}" does not exist')
+
+        self.root_dir: str = root_dir
+        self.mode: str = mode
+        self.overwrite: bool = overwrite
+        self.extensions: Set[str] = set(audio_files) | set(video_files)
+
+        self.inotify = None
+        if use_inotify and INotify is not None:
+            try:
+                self.inotify = INotify()
+            except OSError as error:
+                print(f'\nFailed to set up inotify ({error.strerror}), polling instead')
+
+        # Directory watched by each inotify watch.
+        self.watches: Dict[int, str] = {}
+
+        # Modification time of each directory watched, `None` if the directory is to be read again.
+        self.directories: Dict[str, Optional[int]] = {}
+
+        # Files found so far - the ones being waited upon are mapped to their size, along with the
+        # time at which the size was last seen changing.
+        self.seen: Set[str] = set()
+        self.pending: Dict[str, Tuple[int, float]] = {}
+
+        self.add_directory(root_dir)
+
+    def close(self) -> None:
+        """
+            Stops watching the directory.
+        """
+
+        if self.inotify is not None:
+            self.inotify.close()
+            self.inotify = None
+
+    def watch(self, directory: str) -> None:
+        """
+            Starts watching a single directory, using inotify if possible.
+        """
+
+        if self.inotify is not None:
+            try:
+                mask: int = inotify_flags.CREATE | inotify_flags.MOVED_TO | \
+                    inotify_flags.CLOSE_WRITE
+                self.watches[self.inotify.add_watch(directory, mask)] = directory
+            except OSError as error:
+                # Usually the limit on the number of watches, the rest of the tree is polled.
+                print(f'\nFailed to watch "{directory}" using inotify ({error.strerror}), '
+                      f'polling instead')
+                self.close()
+
+        self.directories[directory] = None
+
+    def add_directory(self, directory: str) -> None:
+        """
+            Watches a directory along with its sub-directories, and adds the files present inside.
+        """
+
+        directories: List[str] = [directory]
+        while directories:
+            directory = directories.pop()
+            if directory in self.directories:
                 continue
 
-            item = join(root_dir, item)
-            if isdir(item):
-                get_file_list(item, mode)
+            # Watching the directory before reading it, a file created in between is never missed.
+            self.watch(directory)
+            directories.extend(self.read_directory(directory))
 
-    return files
+    def read_directory(self, directory: str) -> List[str]:
+        """
+            Adds the files present inside a directory (but not its sub-directories) that have not
+            been seen so far, and returns the sub-directories that are not being watched.
+        """
 
+        children: List[str] = []
 
-def animated_exit() -> None:
+        try:
+            # Directories modified in the last couple of seconds are read again on the next poll,
+            # a file created within the resolution of the modification time would be missed.
+            modified: int = stat(directory).st_mtime_ns
+            self.directories[directory] = modified if time_ns() - modified > 2 * 10 ** 9 else None
+
+            with scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        self.add_file(join(directory, entry.name))
+                    elif self.mode == 'recursive' and entry.name != ignore_dir and \
+                            entry.is_dir() and join(directory, entry.name) not in self.directories:
+                        children.append(join(directory, entry.name))
+        except OSError as error:
+            if directory == self.root_dir:
+                raise
+
+            # The directory was removed (or can't be read), it is no longer watched.
+            print(f'\nSkipping directory "{directory}": {error.strerror}')
+            self.directories.pop(directory, None)
+
+        return children
+
+    def add_file(self, source: str) -> None:
+        """
+            Adds a file to the files being waited upon, unless it has been seen already - or it is
+            not of a supported type.
+        """
+
+        if source not in self.seen and source.rpartition('.')[-1] in self.extensions:
+            self.seen.add(source)
+            self.pending[source] = (-1, perf_counter())
+
+    def poll(self) -> None:
+        """
+            Reads the directories that changed since the last poll again.
+        """
+
+        for directory, modified in list(self.directories.items()):
+            try:
+                if modified is not None and stat(directory).st_mtime_ns == modified:
+                    continue
+            except OSError:
+                # The directory is gone, along with the files inside.
+                del self.directories[directory]
+                continue
+
+            for child in self.read_directory(directory):
+                self.add_directory(child)
+
+    def read_events(self, timeout: float) -> None:
+        """
+            Waits for up to `timeout` seconds for inotify to report changes, and handles them.
+        """
+
+        for event in self.inotify.read(timeout=int(timeout * 1000)):
+            if event.mask & inotify_flags.Q_OVERFLOW:
+                # Events were dropped, every directory is read again to find the files missed.
+                print('\nToo many changes at once, reading every directory again')
+                self.directories = dict.fromkeys(self.directories)
+                self.poll()
+                continue
+
+            directory: Optional[str] = self.watches.get(event.wd)
+            if event.mask & inotify_flags.IGNORED:
+                # The directory was removed.
+                self.watches.pop(event.wd, None)
+                self.directories.pop(directory, None)
+            elif directory is None:
+                continue
+            elif not event.mask & inotify_flags.ISDIR:
+                self.add_file(join(directory, event.name))
+            elif self.mode == 'recursive' and event.name != ignore_dir:
+                self.add_directory(join(directory, event.name))
+
+    def settled(self) -> List[str]:
+        """
+            Returns the files whose size has not changed for `watch_settle_time` seconds, these
+            are no longer waited upon.
+        """
+
+        now: float = perf_counter()
+        ready: List[str] = []
+
+        for source, (size, changed) in list(self.pending.items()):
+            try:
+                current: int = stat(source).st_size
+            except OSError:
+                # Removed (or moved away) before it was converted, seen as a new file if it's back.
+                del self.pending[source]
+                self.seen.discard(source)
+                continue
+
+            if current != size:
+                self.pending[source] = (current, now)
+            elif current and now - changed >= watch_settle_time:
+                del self.pending[source]
+                ready.append(source)
+
+        return ready
+
+    def wait(self) -> List[str]:
+        """
+            Blocks until at least one new file is ready to be converted.
+
+            Returns
+            --------
+            A list containing the full path of each file ready to be converted, sorted by path.
+        """
+
+        while True:
+            if self.inotify is not None:
+                self.read_events(watch_poll_interval)
+            else:
+                sleep(watch_poll_interval)
+                self.poll()
+
+            ready: List[str] = [source for source in self.settled()
+                                if self.overwrite or not isfile(flac_path(source))]
+            if ready:
+                return sorted(ready)
+
+
+def animated_exit(exit_status: int = 0) -> None:
     """
         Implements a nice little animation while waiting for the user to give an input
         to the script.
@@ -134,6 +688,7 @@ def animated_exit() -> None:
         Designed to be used to get user input only before the script quits.
 
         Once the user passes an input to this method, the script will be force killed by this method
+        - with the exit status passed in.
     """
 
     # Vertical spacing to make sure that the animated effect is not lost in a sea of text.
@@ -159,7 +714,7 @@ def animated_exit() -> None:
 
         # Dead thread signifies that the user has entered an input, killing the script.
         if not thread.is_alive():
-            sys_exit()
+            sys_exit(exit_status)
 
 
 def print_time(seconds: int) -> str:
@@ -208,82 +763,92 @@ def print_time(seconds: int) -> str:
     return readable_time.strip()
 
 
-def animated_progress(frame_count: int, total_frames: any, time_elapsed: int) -> None:
+def progress_bar(percentage: float) -> str:
+    """
+        Returns the progress bar for the percentage, made of `progress_bar_count` bars - drawn using
+        `symbol` if it is set.
+    """
+
+    bar_size: float = float(100 / progress_bar_count)
+
+    if len(symbol) != 0:
+        # If the string is not empty, generating a progress bar using the symbol.
+        hashes: int = int(percentage / bar_size)
+        return (symbol * hashes) + (' ' * (progress_bar_count - hashes))
+
+    # If no symbol is set, using the block-y progress bar.
+    completed: int = min(ceil(percentage / bar_size), progress_bar_count)
+    return ('█' * completed) + ((progress_bar_count - completed) * ' ')
+
+
+def animated_progress(time_processed: Union[int, float], total_time: Union[int, float, bool],
+                      time_elapsed: int) -> None:
     """
         Prints a progress bar to the screen with (hopefully) relevant data.
 
         Parameters
         -----------
-        frame_count: Integer containing the number of frames that have been currently processed.
-        Should be less than or equal to `total_frames` and greater than or equal to zero \n
-        total_frames: Total number of frames. Used to calculate the current progress. Integer. \n
-        If the frame count can't be fetched, this variable should be a boolean (false preferably) \n
-        time_elapsed: Count of seconds elapsed before reaching this frame since the processing
-        of the current file started, should be a positive integer. Used to calculate ETA. Integer \n
+        time_processed: Amount of media time (in seconds) that has been converted so far. Should be
+        less than or equal to `total_time` and greater than or equal to zero \n
+        total_time: Duration of the media (in seconds). Used to calculate the current progress. \n
+        If the duration can't be fetched, this variable should be a boolean (false preferably) \n
+        time_elapsed: Count of seconds elapsed since the processing of the current file started,
+        should be a positive integer. Used to calculate ETA. Integer \n
 
         Exceptions
         -----------
         TypeError: Thrown if arguments don't match type hinting. \n
-        ValueError: Thrown if any of the arguments is less than zero, or if value of `frame_count`
-        is greater than the value of `total_frames` \n
-    """
-
-    # Note: While checking if the value of `total_frames` is a boolean or an integer, do NOT use
-    # `isinstance(total_frames, int)`, booleans can be implicitly converted into integers, the check
-    # will always return true. The reverse is not true, i.e. if `total_frames` contains an integer,
-    # `isinstance(total_frames, bool)` will not be true. The latter is used to check for the value
-    # of `total_frames` in this section.
-
-    if not isinstance(frame_count, int) or not isinstance(time_elapsed, int):
-        raise Exception.TypeError('Non-integer argument supplied.')
-    elif frame_count < 0:
-        raise ValueError(f'Frame count [{frame_count}] can\'t be negative')
-    elif not isinstance(total_frames, bool) and total_frames <= 0:
-        # If `total_frames` is an integer and contains a value of less than or equal to 0,
+        ValueError: Thrown if any of the arguments is less than zero, or if value of
+        `time_processed` is greater than the value of `total_time` \n
+    """
+
+    # Note: While checking if the value of `total_time` is a boolean or a number, do NOT use
+    # `isinstance(total_time, int)`, booleans can be implicitly converted into integers, the check
+    # will always return true. The reverse is not true, i.e. if `total_time` contains an integer,
+    # `isinstance(total_time, bool)` will not be true. The latter is used to check for the value
+    # of `total_time` in this section.
+
+    if isinstance(time_processed, bool) or not isinstance(time_processed, (int, float)) \
+            or not isinstance(time_elapsed, int):
+        raise TypeError('Non-numeric argument supplied.')
+    elif time_processed < 0:
+        raise ValueError(f'Time processed [{time_processed}] can\'t be negative')
+    elif not isinstance(total_time, (bool, int, float)):
+        # Throwing this error only if `total_time` is neither a number nor a boolean.
+        raise ValueError(f'Unexpected value in total time: {total_time}')
+    elif not isinstance(total_time, bool) and total_time <= 0:
+        # If `total_time` is a number and contains a value of less than or equal to 0,
         # throwing an error.
-        raise ValueError(f'Total frames [{total_frames}] too less.')
+        raise ValueError(f'Total time [{total_time}] too less.')
 
-    if frame_count > total_frames:
-        # Ensuring that the current frame count isn't larger than the total count.
-        raise ValueError(f'Current frame count [{frame_count}] cannot be greater '
-                         f'than total frame count [{total_frames}]')
+    if not isinstance(total_time, bool) and time_processed > total_time:
+        # Ensuring that the current position isn't beyond the end of the media.
+        raise ValueError(f'Time processed [{time_processed}] cannot be greater '
+                         f'than total time [{total_time}]')
     elif time_elapsed < 0:
         raise ValueError(f'Time elapsed [{time_elapsed}] can\'t be negative')
-    elif not isinstance(total_frames, int) and not isinstance(total_frames, bool):
-        # Throwing this error only if `frame_count` is neither an integer nor a boolean.
-        raise ValueError(f'Unexpected value in total frames: {total_frames}')
 
     percentage: Union[float, str] = 0.0
-    if not isinstance(total_frames, bool):
+    if not isinstance(total_time, bool):
         # The progress will be shown with a progress bar, each bar representing a fixed percentage.
-        percentage: float = round(float(frame_count / total_frames) * 100, 2)
+        percentage: float = round(float(time_processed / total_time) * 100, 2)
 
-    # Calculating the number of seconds remaining to complete- the number of frames being processed
-    # in a single second, divided by the total number of frames.
+    # Calculating the number of seconds remaining to complete- the amount of media being processed
+    # in a single second, divided by the total duration of the media.
     eta: int = 0
-    if time_elapsed > 0:
-        eta = int(total_frames / float(frame_count / time_elapsed))
+    if time_elapsed > 0 and time_processed > 0 and not isinstance(total_time, bool):
+        eta = int(total_time / float(time_processed / time_elapsed))
 
     # The value of `eta` right now is the amount of seconds required to process the entire file
     # from beginning. But, a certain amount of time has already elapsed. Removing that time
     # to get the time remaining.
-    eta = eta - time_elapsed
+    eta = max(eta - time_elapsed, 0)
 
     progress: str = ''
-    bar_size: float = float(100 / progress_bar_count)
 
     # Note: At the end of this block of code, the value inside `percentage` will be a string.
-    if not isinstance(total_frames, bool):
-        if len(symbol) != 0:
-            # If the string is not empty, generating a progress bar using the symbol.
-            hashes: int = int(percentage / bar_size)
-            progress = (symbol * hashes) + \
-                       (' ' * (progress_bar_count - hashes))
-        else:
-            # If no symbol is set, using the block-y progress bar.
-            completed: int = ceil(percentage / bar_size)
-            progress = '█' * completed
-            progress += ((progress_bar_count - completed) * ' ')
+    if not isinstance(total_time, bool):
+        progress = progress_bar(percentage)
 
         # If the last digit after decimal in `percentage` is zero, it'll be ignored this will
         # result in variable length of string - causing problems as the previous message is to be
@@ -296,23 +861,23 @@ def animated_progress(frame_count: int, total_frames: any, time_elapsed: int) ->
         # spaces on the left.
         percentage = (str(percentage) + '%').rjust(7)
     else:
-        # Control reaches this part only when the total frame count is unknown. Replacing percentage
-        # with current frame count.
-        percentage = f'Frames: {frame_count}'
+        # Control reaches this part only when the duration is unknown. Replacing percentage
+        # with the amount of media processed so far.
+        percentage = f'Processed: {print_time(int(time_processed))}'
 
-    # Printing what is available in the progress bar. If the total frame count is not available
-    # then neither will be the current percentage, and so the progress also can't be displayed.
+    # Printing what is available in the progress bar. If the duration is not available then
+    # neither will be the current percentage, and so the progress also can't be displayed.
     print(
 
         # Percentage will always have a value
         f'\r\t{percentage}',
 
         # Printing the progress only if it is not a boolean.
-        progress if not isinstance(total_frames, bool) else '',
+        progress if not isinstance(total_time, bool) else '',
 
-        # Printing the remaining time if total frame count is available.
+        # Printing the remaining time if the duration is available.
         'Remaining: {0}'.format(
-            print_time(eta) if not isinstance(total_frames, bool) else "¯\\_(ツ)_/¯"),
+            print_time(eta) if not isinstance(total_time, bool) else "¯\\_(ツ)_/¯"),
 
         # Separating each part of the string with some extra space.
         sep=' ' * 4,
@@ -322,160 +887,3812 @@ def animated_progress(frame_count: int, total_frames: any, time_elapsed: int) ->
     )
 
 
-def generate_flac_file(original_file: str, *, overwrite: bool = False) -> Tuple[bool, str]:
+class JobProgress(NamedTuple):
+    """
+        Progress of a single conversion, as shown by `ProgressBoard`.
     """
-        Will generate the flac file and save it in the destination directory as required.
 
-        Remarks
-        --------
-        Take in the original file that is to be converted into a flac file, use ffmpeg in the
-        backend to generate a flac file with the same name as the original and save the file in the
-        same directory as the original file.
+    # Name of the file being converted.
+    name: str
 
-        This function handles the most important task of this script, it also has the highest
-        probability of an unexpected failure/crash.
+    # Amount of media (in seconds) converted so far.
+    position: float
 
-        *Realizes that deleting this method will leave bug-free code*
+    # Duration (in seconds) of the media, zero if unknown.
+    duration: float
 
-        (╯°□°）╯︵ ┻━┻
+    # Time at which the conversion started, used to keep the conversions in order.
+    started: float
 
-        Exceptions
-        -----------
-        OSError.FileNotFoundError: Path supplied for the original file is invalid or it points to
-        a directory instead of a file.
 
-        Parameters
-        -----------
-        original_file: Full file path of the original file which is to be converted to flac \n
-        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+class ProgressBoard:
+    """
+        Progress of the conversions running at the same time, drawn by a thread of its own.
 
-        Returns
+        Remarks
         --------
-        A tuple containing a boolean and a string. The value of the boolean is true if the flac 
-        file is generated successfully, false in case of any error.
+        The workers only update the state of their conversions (see `queue`, `start`, `update` and
+        `finish`) - the board is drawn every `dashboard_refresh_interval` seconds, no matter how
+        often the workers report their progress, the workers never wait on the terminal.
 
-        If any error occurs, the message will be printed directly to the screen by this method,
-        the part of returning the error message to the calling function is not required.
+        On a terminal, the board shows a progress bar for each conversion, followed by a line for
+        the whole batch - the amount of audio converted, the speed (in audio-seconds per second,
+        across all the conversions) and the time remaining, based on the duration of the audio yet
+        to be converted. Otherwise (or in batch mode), the line for the whole batch is printed every
+        `dashboard_log_interval` seconds instead.
 
-        If the value of the boolean is true, the string will contain the full path of the flac 
-        file generated. In case if the value of the boolean is false, the string will be empty.
+        The standard output is redirected to the board while it is active (see `write`), any
+        message printed is placed above the board instead of being drawn over.
     """
 
-    if not isfile(original_file):
-        raise FileNotFoundError(f'No file found at the path "{original_file}"')
+    def __init__(self) -> None:
+        # Stream the board is drawn on, and whether it can be redrawn in place.
+        self.stream: Optional[TextIO] = None
+        self.interactive: bool = False
 
-    global process_name
+        self.lock: Lock = Lock()
+        self.stopped: Event = Event()
+        self.thread: Optional[Thread] = None
+        self.redirect: Optional[redirect_stdout] = None
 
-    # Getting the directory in which the original file is stored, creating a new path for the flac
-    # file using this location.
-    directory, file_name = path.split(original_file)
-    flac_file = join(directory, file_name.rpartition('.')[0]) + '.flac'
+        # Conversions running, and the (estimated) duration of the files waiting for a worker.
+        self.jobs: Dict[str, JobProgress] = {}
+        self.waiting: Dict[str, float] = {}
 
-    # Firing a blank input at ffmpeg to get the number of frames in the file. This will result in a
-    # warning as ffmpeg is not to be used to get file info -- `ffprobe` is an alternative
-    # for this - not everyone will be willing to install ffprobe just for this, going with this
-    # hack-y approach to get the number of frames in the video.
-    info_command = f'{process_name} -i "{original_file}"'
-    thread = popen_spawn.PopenSpawn(info_command)
+        # Number of files handed over to the board, number of files done, and the audio converted
+        # by the files done.
+        self.total: int = 0
+        self.done: int = 0
+        self.done_audio: float = 0.0
 
-    # Once the process finishes, getting the result from the command.
-    output = str(thread.read())
+        # Text printed since the board was last drawn, and the number of lines the board took.
+        self.text: str = ''
+        self.drawn_lines: int = 0
 
-    try:
-        output = output.replace('\\r', '').replace('\\n', '')
-        # Using regex to get string containing number of frames, extracting just the digits out of
-        # the string - and converting into integer.
-        frame_count = int(search('[0-9]+', search(r'NUMBER_OF_FRAMES-[a-zA-Z]+:(\s*)[0-9]+', output)
-                                 .group()).group().strip())
-    except Exception:
-        # If the dialog does not contain count - flow-of-control end here. Setting `frame_count`
-        # to be false. Used to know that the frame length of the file could not be detected.
-        frame_count = False
-
-    # Creating a string for all the arguments that will be used along with the ffmpeg base command.
-    command = f'{process_name} -i "{original_file.strip()}" -c:a flac "{flac_file.strip()}"'
-
-    if overwrite:
-        # If existing files are to be overwritten, appending '-y' to ffmpeg command.
-        command += ' -y'
+        self.start_time: float = perf_counter()
+        self.last_log: float = self.start_time
 
-    # Getting the start time before firing the process.
-    start_time: int = int(time())
+    def __enter__(self) -> 'ProgressBoard':
+        global dashboard
 
-    # Creating a process that uses ffmpeg along the with the parameters to generate a flac file.
-    thread = popen_spawn.PopenSpawn(command)
-    frame_counter = thread.compile_pattern_list(
-        [pexpect.EOF, "frame= *[0-9]+", "(.+)"])
+        self.stream = sys.stdout
+        self.interactive = self.stream.isatty() and not batch_mode
 
-    thread.compile_pattern_list([pexpect.EOF, "NUMBER_OF_FRAMES"])
+        self.redirect = redirect_stdout(self)
+        self.redirect.__enter__()
 
-    while True:
-        sleep(1)
-        result = thread.expect_list(frame_counter, timeout=10)
-        if result == 0:
-            # Reaches here only when the process has ended. Breaking out of the loop.
-            break
-        elif result == 1:
-            # Getting the total number of frames processed.
-            count = search('[0-9]+', (str(thread.match.group(0)))).group()
-            animated_progress(int(count), frame_count,
-                              int(time()) - start_time)
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
 
-    return True, flac_file
+        dashboard = self
+        return self
 
+    def __exit__(self, *exception) -> None:
+        global dashboard
 
-if __name__ == '__main__':
-    # A (fancy) welcome message, because why not
-    #
-    # ╮(╯▽╰)╭
-    welcome_message: str = \
+        dashboard = None
+        self.stopped.set()
+        self.thread.join()
+        self.redirect.__exit__(*exception)
+
+    def queue(self, source: str) -> None:
         """
-             ____  __     __    ___       ___  ____  __ _  ____  ____   __  ____  __  ____
-            (  __)(  )   / _\  / __)     / __)(  __)(  ( \(  __)(  _ \ / _\(_  _)/  \(  _ \\
-             ) _) / (_/\/    \( (__     ( (_ \ ) _) /    / ) _)  )   //    \ )( (  O ))   /
-            (__)  \____/\_/\_/ \___)     \___/(____)\_)__)(____)(__\_)\_/\_/(__) \__/(__\_)
+            Adds a file waiting to be converted, its (estimated) duration counts towards the time
+            remaining. A file that has already been added is ignored.
         """
 
-    # Printing the welcome message at the start of the script.
-    print(welcome_message)
+        if source in self.waiting or source in self.jobs:
+            # Already queued, the sources might be handed over before the conversions begin.
+            return
 
-    # If length of `symbol` string is more than 4 characters, trimming it down to 4 characters.
-    symbol = symbol[:4] if len(symbol) > 4 else symbol
+        duration: float = estimate_duration(source)
+        with self.lock:
+            self.waiting[source] = duration
+            self.total += 1
 
-    # Ensuring that the number of progress bars is an integer as it will be multiplied to a string.
-    progress_bar_count = int(progress_bar_count)
+    def start(self, source: str) -> None:
+        """
+            Marks the conversion of a file as started.
+        """
 
-    # Emptying the list as an edge-case precaution.
-    files = []
+        with self.lock:
+            self.jobs[source] = JobProgress(path.basename(source), 0.0,
+                                            self.waiting.pop(source, 0.0), perf_counter())
 
-    # Flag indicating if the interactive mode is to be used or not. True by default - disabled if
-    # user has passed command-line arguments.
-    interactive_mode: bool = True
+    def update(self, source: str, position: float, duration: Optional[float]) -> None:
+        """
+            Updates the amount of media converted (and the duration, if known) for a file.
+        """
 
-    root = getcwd()
-    force_write = False
+        with self.lock:
+            job: Optional[JobProgress] = self.jobs.get(source)
+            if job is not None:
+                self.jobs[source] = job._replace(position=position,
+                                                 duration=duration or job.duration)
 
-    pattern_root = r'^--root="?(.*)"?$'
-    pattern_force_write = r'^--force(="?yes"?|="?no"?)?$'
+    def finish(self, source: str, duration: float) -> None:
+        """
+            Marks the conversion of a file as done, `duration` being the duration of its audio.
+        """
 
-    if len(argv):
-        interactive_mode = False  # Disabling interactive mode.
+        with self.lock:
+            job: Optional[JobProgress] = self.jobs.pop(source, None)
+            estimate: float = self.waiting.pop(source, job.duration if job else 0.0)
 
-        # If an input parameter has been passed, extracting valid values before running the script.
-        # Skipping the first parameter since it is the name of the script, and not an argument.
-        for argument in argv[1:]:
-            if match(pattern_root, argument):
-                root = search(pattern_root, argument).groups()[0]
+            self.done += 1
+            self.done_audio += duration or estimate
 
-                if not isdir(root):
-                    # Force-stop if the path does not point to a valid directory.
-                    print(f'''
-                        Unexpected value for the root directory: `{root}`
+    def processed(self) -> float:
+        """
+            Returns the amount of audio (in seconds) converted so far, across all the conversions.
+        """
+
+        with self.lock:
+            return self.done_audio + sum(job.position for job in self.jobs.values())
+
+    def write(self, text: str) -> int:
+        """
+            Collects the text printed while the board is active, printed above the board the next
+            time it is drawn.
+        """
+
+        with self.lock:
+            self.text += text
+        return len(text)
+
+    def flush(self) -> None:
+        """
+            Nothing to be done, the text is printed as the board is drawn.
+        """
+
+    def status(self) -> str:
+        """
+            Returns the line describing the progress of the whole batch. Should be called while
+            holding the lock.
+        """
+
+        processed: float = self.done_audio + sum(job.position for job in self.jobs.values())
+        remaining: float = sum(self.waiting.values()) + sum(
+            max(job.duration - job.position, 0.0) for job in self.jobs.values())
+
+        speed: float = processed / max(perf_counter() - self.start_time, 1e-6)
+        percentage: float = processed / (processed + remaining) * 100 if processed else 0.0
+        eta: str = print_time(int(remaining / speed)) if speed > 0 else '¯\\_(ツ)_/¯'
+
+        return f'{self.done}/{self.total} files done, {round(percentage, 1)}% of the audio, ' \
+               f'{round(speed, 1)}x, Remaining: {eta}'
+
+    def render(self, final: bool = False) -> None:
+        """
+            Prints the text collected since the last call, and draws the board again - or prints
+            the line for the whole batch, if the board can't be drawn in place.
+        """
+
+        with self.lock:
+            # Only complete lines are printed, the rest is left for the next call.
+            if final:
+                text, self.text = self.text.rstrip('\n'), ''
+            else:
+                text, _, self.text = self.text.rpartition('\n')
+
+            lines: List[str] = []
+            if self.interactive and not final:
+                for job in sorted(self.jobs.values(), key=lambda job: job.started):
+                    if job.duration > 0:
+                        percentage: float = min(job.position / job.duration * 100, 100)
+                        lines.append(f'\t{progress_bar(percentage)}  '
+                                     f'{("%.02f%%" % percentage).rjust(7)}    {job.name}')
+                    else:
+                        lines.append(f'\t{" " * progress_bar_count}  Processed: '
+                                     f'{print_time(int(job.position))}    {job.name}')
+                lines.append(self.status())
+            elif not self.interactive and not final and \
+                    perf_counter() - self.last_log >= dashboard_log_interval:
+                self.last_log = perf_counter()
+                lines.append(self.status())
+
+        # Lines longer than the terminal wrap around, breaking the count of lines to be redrawn.
+        width: int = get_terminal_size().columns - 1
+        output: str = f'\x1b[{self.drawn_lines}F\x1b[J' if self.drawn_lines else ''
+        output += f'{text}\n' if text else ''
+        output += ''.join(f'{line[:width] if self.interactive else line}\n' for line in lines)
+
+        self.drawn_lines = len(lines) if self.interactive else 0
+        if output:
+            self.stream.write(output)
+            self.stream.flush()
+
+    def run(self) -> None:
+        """
+            Draws the board every `dashboard_refresh_interval` seconds until the board is stopped,
+            and one last time after that.
+        """
+
+        while not self.stopped.wait(dashboard_refresh_interval):
+            self.render()
+
+        self.render(final=True)
+
+
+class SystemLoad(NamedTuple):
+    """
+        Load of the system, as sampled by `system_load`. Each value is `None` if it can't be read
+        on the platform.
+    """
+
+    # Load average over the last minute, per core.
+    cpu: Optional[float]
+
+    # Fraction of the memory available.
+    memory: Optional[float]
+
+    # Share of the time (in percent, over the last 10 seconds) tasks spent waiting on the disks.
+    io: Optional[float]
+
+
+def system_load() -> SystemLoad:
+    """
+        Samples the load of the system - the load average, the memory available (`/proc/meminfo`)
+        and the pressure on the disks (`/proc/pressure/io`, Linux 4.20 and up).
+    """
+
+    cpu: Optional[float] = None
+    if getloadavg is not None:
+        try:
+            cpu = getloadavg()[0] / (cpu_count() or 1)
+        except OSError:
+            pass
+
+    memory: Optional[float] = None
+    try:
+        with open('/proc/meminfo', 'r') as file:
+            fields: Dict[str, int] = {line.split(':')[0]: int(line.split()[1]) for line in file}
+        memory = fields['MemAvailable'] / fields['MemTotal']
+    except (OSError, KeyError, ValueError, IndexError, ZeroDivisionError):
+        pass
+
+    io: Optional[float] = None
+    try:
+        with open('/proc/pressure/io', 'r') as file:
+            io = float(search(r'^some avg10=([0-9.]+)', file.read()).groups()[0])
+    except (OSError, AttributeError, ValueError):
+        pass
+
+    return SystemLoad(cpu, memory, io)
+
+
+class ConcurrencyController:
+    """
+        Adapts the number of files converted at the same time to the load of the system, between
+        `minimum` and `maximum`.
+
+        Remarks
+        --------
+        Every `adaptive_interval` seconds, the load of the system is sampled (see `system_load`)
+        along with the overall speed of the conversions (audio-seconds converted per second, read
+        from the `ProgressBoard`). A worker is removed if the system is running low on memory, or
+        if it is overloaded (other services running on the machine count towards the load). A
+        worker is added if all the workers are busy, and there is room to spare - the load is
+        below `adaptive_target_load`, and the disks are not under pressure.
+
+        Once a worker is added, the overall speed over the next interval tells if it helped -
+        conversions bound by the disks (or by the CPU) do not speed up with more workers. If the
+        speed did not improve by `adaptive_min_gain`, the worker is removed, and no worker is added
+        for the next `adaptive_cooldown` intervals. The load average trails the actual load, no
+        other worker is removed for overloading the system for as many intervals either.
+
+        Each change is printed along with the samples it was based on, to help tune the bounds.
+
+        Parameters
+        -----------
+        board: Dashboard of the conversions, see `ProgressBoard` \n
+        minimum: Least number of workers \n
+        maximum: Most number of workers \n
+    """
+
+    def __init__(self, board: ProgressBoard, minimum: int, maximum: int) -> None:
+        self.board: ProgressBoard = board
+        self.minimum: int = minimum
+        self.maximum: int = maximum
+
+        # Starting at the lower bound, workers are only added once they prove to be useful.
+        self.workers: int = minimum
+
+        # Overall speed before the last worker was added (`None` unless a worker was just added),
+        # and the number of intervals left before a worker can be added (or removed for the load).
+        self.previous_speed: Optional[float] = None
+        self.cooldown: int = 0
+
+        self.last_time: float = perf_counter()
+        self.last_processed: float = 0.0
+
+    def decide(self, load: SystemLoad, speed: float, running: int) -> Tuple[int, str]:
+        """
+            Returns the number of workers to be used from now on, along with the reason.
+        """
+
+        previous_speed, self.previous_speed = self.previous_speed, None
+        cooldown, self.cooldown = self.cooldown, max(self.cooldown - 1, 0)
+
+        if load.memory is not None and load.memory < adaptive_min_memory:
+            return max(self.workers - 1, self.minimum), 'running low on memory'
+        elif load.cpu is not None and load.cpu > adaptive_max_load and not cooldown:
+            self.cooldown = adaptive_cooldown
+            return max(self.workers - 1, self.minimum), 'the system is overloaded'
+        elif previous_speed is not None and speed < previous_speed * (1 + adaptive_min_gain):
+            self.cooldown = adaptive_cooldown
+            return max(self.workers - 1, self.minimum), 'the last worker added did not help'
+        elif running < self.workers or cooldown:
+            return self.workers, 'holding'
+        elif load.io is not None and load.io > adaptive_max_io_pressure:
+            return self.workers, 'the disks are busy'
+        elif load.cpu is not None and load.cpu > adaptive_target_load:
+            return self.workers, 'no room to spare'
+
+        if self.workers < self.maximum:
+            self.previous_speed = speed
+        return min(self.workers + 1, self.maximum), 'room to spare'
+
+    def update(self, running: int) -> int:
+        """
+            Reconsiders the number of workers, if `adaptive_interval` seconds have passed since
+            the last call that did so.
+
+            Parameters
+            -----------
+            running: Number of jobs running at the moment \n
+
+            Returns
+            --------
+            The number of workers to be used from now on.
+        """
+
+        now: float = perf_counter()
+        if now - self.last_time < adaptive_interval:
+            return self.workers
+
+        processed: float = self.board.processed()
+        speed: float = (processed - self.last_processed) / (now - self.last_time)
+        self.last_time, self.last_processed = now, processed
+
+        load: SystemLoad = system_load()
+        workers, reason = self.decide(load, speed, running)
+
+        if workers != self.workers:
+            samples: List[str] = [f'{round(speed, 1)}x overall',
+                                  f'{round(speed / max(running, 1), 1)}x per job']
+            if load.cpu is not None:
+                samples.append(f'load {round(load.cpu, 2)} per core')
+            if load.memory is not None:
+                samples.append(f'{round(load.memory * 100)}% memory available')
+            if load.io is not None:
+                samples.append(f'I/O pressure {round(load.io, 1)}%')
+
+            print(f'Workers: {self.workers} -> {workers}, {reason} ({", ".join(samples)})')
+            self.workers = workers
+
+        return self.workers
+
+
+def report_progress(source: str, position: float, duration: Optional[float]) -> None:
+    """
+        Reports the progress of the conversion of a file to the dashboard, if there is one.
+    """
+
+    if dashboard is not None:
+        dashboard.update(source, position, duration)
+
+
+def add_phase_time(phase: str, seconds: float) -> None:
+    """
+        Adds the time spent in a phase to the phases of the file being converted (see
+        `phase_times`), does nothing outside a conversion.
+    """
+
+    times: Optional[Dict[str, float]] = phase_times.get()
+    if times is not None:
+        times[phase] = times.get(phase, 0.0) + seconds
+
+
+@contextmanager
+def timed(phase: str) -> Iterator[None]:
+    """
+        Context manager adding the time spent inside the block to a phase of the file being
+        converted, see `add_phase_time`. Uses a monotonic clock, unaffected by changes to the
+        system time.
+    """
+
+    start_time: float = perf_counter()
+    try:
+        yield
+    finally:
+        add_phase_time(phase, perf_counter() - start_time)
+
+
+class ConversionProgress(NamedTuple):
+    """
+        Snapshot of the state of a conversion, built from a single block of the key=value progress
+        stream written by ffmpeg (`-progress pipe:1`).
+
+        Remarks
+        --------
+        Fields that ffmpeg reports as `N/A` (the speed and bitrate are unknown during the first
+        moments of a conversion) are set to `None`.
+    """
+
+    # Amount of media (in seconds) that has been converted so far.
+    out_time: float
+
+    # Speed of the conversion, as a multiple of real time.
+    speed: Optional[float]
+
+    # Bitrate of the output (in kbits/s).
+    bitrate: Optional[float]
+
+    # Size of the output (in bytes) written so far.
+    total_size: int
+
+    # True if this was the last block written by ffmpeg, i.e. the conversion is over.
+    done: bool
+
+
+def parse_duration(line: str) -> Optional[float]:
+    """
+        Extracts the duration (in seconds) from the `Duration: HH:MM:SS.ss` line present in the
+        header printed by ffmpeg for each input.
+
+        Returns
+        --------
+        Float containing the duration, `None` if the line does not contain a duration - or if the
+        duration is unknown (ffmpeg reports `Duration: N/A` for such streams).
+    """
+
+    found = search(r'Duration: *([0-9]+):([0-9]+):([0-9.]+)', line)
+    if not found:
+        return None
+
+    hours, minutes, seconds = found.groups()
+    duration: float = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    return duration if duration > 0 else None
+
+
+def parse_progress_line(line: str, fields: Dict[str, str]) -> Optional[ConversionProgress]:
+    """
+        Feeds a single line of the progress stream written by ffmpeg to the parser.
+
+        Remarks
+        --------
+        ffmpeg writes the progress as blocks of `key=value` lines, each block terminated by a
+        `progress=continue` (or `progress=end` for the final block) line. The lines of the current
+        block are accumulated inside `fields`, a snapshot is returned once the block is complete.
+
+        Parameters
+        -----------
+        line: String containing a single line of output, without the trailing newline \n
+        fields: Dictionary holding the fields of the block read so far. Should be an empty
+        dictionary when the first line is fed to this method, and the same dictionary should be
+        passed for every line that follows \n
+
+        Returns
+        --------
+        `ConversionProgress` built from the block once its last line is fed to the parser, `None`
+        for any other line. Lines that are not of the form `key=value` are ignored.
+    """
+
+    found = match(r'^([a-z0-9_]+)=(.*)$', line)
+    if not found:
+        return None
+
+    key, value = found.groups()
+    if key != 'progress':
+        fields[key] = value.strip()
+        return None
+
+    def number(text: Optional[str], suffix: str) -> Optional[float]:
+        # Converts a field such as `1411.2kbits/s` or `2.5x` into a float, `N/A` being `None`.
+        try:
+            return float(text[:len(text) - len(suffix)] if text.endswith(suffix) else text)
+        except (AttributeError, ValueError):
+            return None
+
+    # `out_time_us` contains the position in microseconds, so does `out_time_ms` - the name of the
+    # latter is misleading, and it is only used as a fallback for older versions of ffmpeg.
+    out_time = number(fields.get('out_time_us', fields.get('out_time_ms')), '')
+    total_size = number(fields.get('total_size'), '')
+
+    progress = ConversionProgress(
+        out_time=max(out_time / 1e6, 0.0) if out_time is not None else 0.0,
+        speed=number(fields.get('speed'), 'x'),
+        bitrate=number(fields.get('bitrate'), 'kbits/s'),
+        total_size=int(total_size) if total_size is not None else 0,
+        done=value.strip() == 'end'
+    )
+
+    fields.clear()
+    return progress
+
+
+class AudioStream(NamedTuple):
+    """
+        Details of an audio stream, as printed by ffmpeg in the header of a file.
+    """
+
+    # Language of the stream, empty string if the stream does not have a language tag.
+    language: str
+
+    # Name of the codec the stream is encoded with, for instance `pcm_s16le` or `aac`.
+    codec: str
+
+    # Sample rate (in Hz), zero if unknown.
+    sample_rate: int
+
+    # Layout of the channels, for instance `mono`, `stereo` or `5.1(side)`. Empty string if unknown.
+    channel_layout: str
+
+
+class MediaInfo(NamedTuple):
+    """
+        Details of a media file, as printed by ffmpeg in the header of the file.
+    """
+
+    # Duration (in seconds), `None` if unknown.
+    duration: Optional[float]
+
+    # Audio streams present in the file, in the same order as in the file.
+    streams: List[AudioStream]
+
+
+def parse_media_info(header: str) -> List[MediaInfo]:
+    """
+        Extracts the details of each input from the header printed by ffmpeg.
+
+        Remarks
+        --------
+        Only the part of the header describing the inputs is used - the streams listed after the
+        `Output #` (or `Stream mapping`) line belong to the output(s).
+
+        Returns
+        --------
+        List containing the details of each input, in the order of the inputs.
+    """
+
+    header = header.split('Stream mapping:')[0].split('Output #')[0]
+
+    media_infos: List[MediaInfo] = []
+    for section in header.split('Input #')[1:]:
+        streams: List[AudioStream] = [
+            AudioStream(language or '', codec, int(sample_rate or 0), layout.strip())
+            for language, codec, sample_rate, layout in findall(
+                r'Stream #[0-9]+:[0-9]+(?:\[[^]]*\])?(?:\(([^)]*)\))?[^:]*: Audio: ([^ ,]+)'
+                r'[^,\n]*(?:, ([0-9]+) Hz)?(?:, ([^,\n]+))?', section)
+        ]
+        media_infos.append(MediaInfo(parse_duration(section), streams))
+
+    return media_infos
+
+
+class FfmpegOutput:
+    """
+        Reads the output of an ffmpeg process started by `ffmpeg_command`, one line at a time.
+
+        Remarks
+        --------
+        The lines are fed by the caller, this class does not care how they are read - the same
+        parser is used by `run_ffmpeg` (reading through pexpect) and `run_ffmpeg_async` (reading
+        through an asyncio subprocess).
+    """
+
+    def __init__(self) -> None:
+        # Duration of the first input, read from the header. `None` until (and unless) found.
+        self.duration: Optional[float] = None
+
+        # Lines printed before the first progress block, the header describing the input(s).
+        self.header: List[str] = []
+        self.header_done: bool = False
+
+        # Fields of the progress block being read, and the last line that was not part of the
+        # progress stream.
+        self.fields: Dict[str, str] = {}
+        self.last_message: str = ''
+
+        # Set once the final progress block is read. ffmpeg can exit with a zero status without
+        # having written anything (for instance, if the output already exists), this flag is used
+        # to tell such runs apart from successful ones.
+        self.finished: bool = False
+
+        # Furthest position (media converted, and bytes written) reported so far, and the time at
+        # which the process last moved forward - used to detect a stuck process.
+        self.position: Tuple[float, int] = (0.0, 0)
+        self.last_advance: float = time()
+
+    def feed(self, line: str) -> Optional[ConversionProgress]:
+        """
+            Feeds a single line of output (without the trailing newline) to the reader.
+
+            Returns
+            --------
+            `ConversionProgress` once a progress block (other than the final one) is complete,
+            `None` for any other line.
+        """
+
+        progress = parse_progress_line(line, self.fields)
+
+        if progress is None:
+            if self.duration is None and parse_duration(line):
+                self.duration = parse_duration(line)
+            elif len(line) > 0 and '=' not in line:
+                self.last_message = line
+
+            if not self.header_done:
+                # Lines of the header are written while the input(s) are being opened.
+                self.last_advance = time()
+                self.header.append(line)
+            return None
+
+        # The header is complete once the first progress block is read.
+        self.header_done = True
+
+        if progress.out_time > self.position[0] or progress.total_size > self.position[1]:
+            self.position = (max(progress.out_time, self.position[0]),
+                             max(progress.total_size, self.position[1]))
+            self.last_advance = time()
+
+        if progress.done:
+            self.finished = True
+            return None
+
+        return progress
+
+    def stalled(self) -> bool:
+        """
+            Checks if the process has gone without making progress for longer than
+            `stall_timeout`.
+
+            Remarks
+            --------
+            A process that is alive but stuck can keep writing progress blocks, the check relies
+            on the position reported moving forward - not on the process writing something.
+        """
+
+        return 0 < stall_timeout < time() - self.last_advance
+
+    def media_infos(self) -> List[MediaInfo]:
+        """
+            Returns the details of each input, read from the header.
+        """
+
+        return parse_media_info('\n'.join(self.header))
+
+
+class ConversionStalled(Exception):
+    """
+        Raised once an ffmpeg process is killed for having made no progress for longer than
+        `stall_timeout`.
+    """
+
+
+class OutputExists(Exception):
+    """
+        Raised instead of converting a file whose flac file exists already, unless the flac file
+        is to be overwritten. The file is reported as skipped, not as failed.
+    """
+
+
+def metadata_connection() -> Optional[Connection]:
+    """
+        Returns the connection to the metadata cache, opening the cache on the first call.
+
+        Remarks
+        --------
+        The same connection is shared by all the threads, any access to it should be made while
+        holding `metadata_lock`. If the cache can't be opened, the reason is printed and the cache
+        is disabled for the rest of the run.
+
+        Returns
+        --------
+        The connection, `None` if the cache is disabled.
+    """
+
+    global metadata_cache, metadata_database
+
+    if not metadata_cache:
+        return None
+    elif metadata_database is not None:
+        return metadata_database
+
+    try:
+        if path.dirname(metadata_cache):
+            makedirs(path.dirname(metadata_cache), exist_ok=True)
+
+        metadata_database = connect(metadata_cache, timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        metadata_database.execute('PRAGMA journal_mode=WAL')
+        metadata_database.execute('CREATE TABLE IF NOT EXISTS media (path TEXT PRIMARY KEY, '
+                                  'size INTEGER NOT NULL, mtime INTEGER NOT NULL, duration REAL, '
+                                  'streams TEXT NOT NULL)')
+    except (OSError, DatabaseError) as error:
+        print(f'\nDisabling the metadata cache "{metadata_cache}": {error}')
+        metadata_cache, metadata_database = '', None
+
+    return metadata_database
+
+
+def get_cached_info(source: str) -> Optional[MediaInfo]:
+    """
+        Looks up the details of a file in the metadata cache.
+
+        Remarks
+        --------
+        Entries are keyed by the absolute path of the file, and are only used if the size and the
+        modification time of the file are the same as when the entry was saved - an entry for a
+        file that has changed since is treated as missing, and overwritten by the next probe.
+
+        Returns
+        --------
+        The details of the file, `None` if the file is not in the cache (or the cache is disabled).
+    """
+
+    with metadata_lock:
+        database: Optional[Connection] = metadata_connection()
+        if database is None:
+            return None
+
+        try:
+            info = stat(source)
+            row = database.execute('SELECT duration, streams FROM media '
+                                   'WHERE path = ? AND size = ? AND mtime = ?',
+                                   (path.abspath(source), info.st_size, info.st_mtime_ns)).fetchone()
+        except (OSError, DatabaseError):
+            return None
+
+    if row is None:
+        return None
+
+    return MediaInfo(row[0], [AudioStream(*stream) for stream in loads(row[1])])
+
+
+def cache_info(source: str, media_info: MediaInfo) -> None:
+    """
+        Saves the details of a file in the metadata cache, replacing any previous entry for it.
+    """
+
+    with metadata_lock:
+        database: Optional[Connection] = metadata_connection()
+        if database is None:
+            return
+
+        try:
+            info = stat(source)
+            database.execute('INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?)',
+                             (path.abspath(source), info.st_size, info.st_mtime_ns,
+                              media_info.duration, dumps(media_info.streams)))
+        except (OSError, DatabaseError) as error:
+            print(f'\nFailed to cache the details of "{source}": {error}')
+
+
+def probe_file(original_file: str) -> MediaInfo:
+    """
+        Reads the details of a file from the header printed by ffmpeg.
+
+        Remarks
+        --------
+        Fires a separate ffmpeg process without any output, this is only required when the details
+        are needed before the conversion begins - while extracting all the audio tracks (or a track
+        in a specific language) from a video file, or while splitting a long file into segments.
+
+        The details are read from the metadata cache if present, ffmpeg is only fired for files that
+        are not in the cache (or have changed since), the details are then saved in the cache.
+    """
+
+    media_info: Optional[MediaInfo] = get_cached_info(original_file)
+    if media_info is not None:
+        return media_info
+
+    with timed('probe'):
+        thread = popen_spawn.PopenSpawn(f'{process_name} -hide_banner -nostdin -i '
+                                        f'"{original_file}"')
+        media_infos: List[MediaInfo] = parse_media_info(thread.read().decode(errors='replace'))
+        thread.wait()
+
+    media_info = media_infos[0] if media_infos else MediaInfo(None, [])
+
+    cache_info(original_file, media_info)
+    return media_info
+
+
+def audio_stream_maps(original_file: str) -> List[str]:
+    """
+        Builds the `-map` option(s) selecting the audio track(s) to be extracted from a video
+        file, as configured through `audio_tracks`.
+
+        Exceptions
+        -----------
+        ValueError: Thrown if the track requested is not present in the file.
+
+        Returns
+        --------
+        List containing the `-map` option for each flac file to be generated. A single empty string
+        if ffmpeg is left to pick the audio track.
+    """
+
+    if audio_tracks == 'default':
+        return ['']
+    elif audio_tracks.isdigit():
+        return [f'-map 0:a:{audio_tracks}']
+
+    languages: List[str] = [stream.language for stream in probe_file(original_file).streams]
+
+    if audio_tracks != 'all':
+        if audio_tracks not in languages:
+            raise ValueError(f'No audio track in the language `{audio_tracks}`')
+
+        return [f'-map 0:a:{languages.index(audio_tracks)}']
+    elif not languages:
+        raise ValueError('No audio track found')
+
+    return [f'-map 0:a:{i}' for i in range(len(languages))]
+
+
+def audio_only_arguments(flac_file: str, maps: List[str]) -> Tuple[List[str], List[str]]:
+    """
+        Builds the output arguments used to extract the audio from a video file, as configured
+        through `audio_tracks`.
+
+        Remarks
+        --------
+        Video, subtitle and data streams are disabled, ffmpeg does not decode anything other than
+        the audio track(s) selected.
+
+        Parameters
+        -----------
+        flac_file: Full path of the flac file to be generated \n
+        maps: List of `-map` options as returned by `audio_stream_maps` \n
+
+        Returns
+        --------
+        A tuple containing the arguments to be placed after the input in the ffmpeg command, and a
+        list containing the full path of each flac file that will be generated. The arguments
+        point ffmpeg to the partial path of each flac file, see `partial_path`.
+    """
+
+    disabled: List[str] = ['-vn', '-sn', '-dn']
+
+    if len(maps) == 1:
+        return [*disabled, *maps[0].split(), '-c:a', 'flac', partial_path(flac_file)], [flac_file]
+
+    # One output per audio track, all of them written by a single pass over the container.
+    base: str = flac_file.rpartition('.')[0]
+    outputs: List[str] = [f'{base}.track{i + 1}.flac' for i in range(len(maps))]
+    arguments: List[str] = [argument for i in range(len(outputs)) for argument in
+                            [*disabled, *maps[i].split(), '-c:a', 'flac', partial_path(outputs[i])]]
+
+    return arguments, outputs
+
+
+def ffmpeg_command(arguments: List[str]) -> List[str]:
+    """
+        Builds the command used to run ffmpeg with the given arguments.
+
+        Remarks
+        --------
+        Instead of the human-readable status line, ffmpeg is asked to write its progress as blocks of
+        key=value lines on stdout. `-nostdin` ensures that ffmpeg never waits for an input from the
+        user - if an output exists and is not to be overwritten, the process simply exits.
+
+        The command is a list of arguments, passed to the process as-is - paths are never quoted,
+        and split again, in a way that depends on the platform.
+    """
+
+    return [process_name, '-nostdin', '-nostats', '-progress', 'pipe:1', *arguments]
+
+
+def remove_outputs(outputs: Iterable[str]) -> None:
+    """
+        Removes the (partial) output files left behind by an ffmpeg process that was killed.
+    """
+
+    for file in outputs:
+        if isfile(file):
+            remove(file)
+
+
+def run_ffmpeg(arguments: List[str], *,
+               on_progress: Optional[Callable[[ConversionProgress, Optional[float]], None]] = None,
+               outputs: Iterable[str] = (),
+               overwrite: bool = False) -> Tuple[bool, List[MediaInfo], str]:
+    """
+        Runs an ffmpeg process with the given arguments, reading its output as it is written.
+
+        Remarks
+        --------
+        The details of the input (including its duration) are read from the header printed by this
+        very process before the conversion begins, there is no need to fire a separate process just
+        to get file info.
+
+        A process that makes no progress for longer than `stall_timeout` is killed, and its
+        partial output(s) removed - the process going quiet for a while is not enough, reading from
+        a slow disk (or a network share) can hold it up for some time.
+
+        The time taken by the process to write its first line (starting up, and opening the
+        input) is added to the `spawn` phase of the file, the rest to the `encode` phase.
+
+        Exceptions
+        -----------
+        ConversionStalled: The process was killed as it stopped making progress.
+
+        Parameters
+        -----------
+        arguments: List containing the arguments (inputs, outputs and options) for ffmpeg \n
+        on_progress: Function called with each `ConversionProgress` read, along with the duration
+        of the (first) input - `None` if unknown. Optional \n
+        outputs: Full path of each file written by ffmpeg, removed if the process is killed \n
+        overwrite: Boolean indicating if the outputs are being overwritten. Default --> false \n
+
+        Returns
+        --------
+        A tuple containing a boolean, true if ffmpeg exited successfully after writing its final
+        progress block, the details of each input, and the last line of output that was not part
+        of the progress stream - if ffmpeg fails, this line contains the reason.
+    """
+
+    # Outputs that are safe to remove if the process is killed, i.e. outputs written by this very
+    # process.
+    outputs = [file for file in outputs if overwrite or not isfile(file)]
+
+    start_time: float = perf_counter()
+    spawned: Optional[float] = None
+
+    thread = popen_spawn.PopenSpawn(ffmpeg_command(arguments), timeout=stall_check_interval)
+    output: FfmpegOutput = FfmpegOutput()
+
+    while True:
+        try:
+            # Splitting the lines on `\n` - `readline` splits on `os.linesep`, `\r\n` on Windows,
+            # while the progress stream is written with `\n` alone. The last line might not end
+            # with a newline, an empty line is returned once the process has ended.
+            ended: bool = thread.expect([b'\n', pexpect.EOF]) == 1
+            line = thread.before + (b'' if ended else b'\n')
+        except pexpect.TIMEOUT:
+            # Nothing written for a while, checked for a stall below.
+            line = None
+
+        if line and spawned is None:
+            spawned = perf_counter()
+            add_phase_time('spawn', spawned - start_time)
+
+        if output.stalled():
+            # Not waiting for the process to exit, a process stuck on a read might not exit until
+            # the read is over.
+            thread.proc.kill()
+            remove_outputs(outputs)
+            raise ConversionStalled(f'ffmpeg made no progress for {print_time(int(stall_timeout))}')
+        elif line is None:
+            continue
+        elif not line:
+            # Reaches here only when the process has ended. Breaking out of the loop.
+            break
+
+        progress = output.feed(line.decode(errors='replace').strip())
+        if progress is not None and on_progress:
+            on_progress(progress, output.duration)
+
+    exit_status: int = thread.wait()
+    add_phase_time('encode', perf_counter() - (spawned or start_time))
+
+    return exit_status == 0 and output.finished, output.media_infos(), output.last_message
+
+
+async def run_ffmpeg_async(arguments: List[str], *,
+                           on_progress: Optional[Callable[[ConversionProgress, Optional[float]],
+                                                          None]] = None,
+                           outputs: Iterable[str] = (),
+                           overwrite: bool = False) -> Tuple[bool, List[MediaInfo], str]:
+    """
+        Counterpart of `run_ffmpeg` for the `async` engine, runs ffmpeg as an asyncio subprocess.
+
+        Remarks
+        --------
+        If the coroutine is cancelled (the conversion timed out, or the user hit Ctrl-C), the
+        process is killed and the partial output(s) are removed before the cancellation is passed
+        on. An output that existed before the process was started is only removed when it was
+        being overwritten - ffmpeg never touches it otherwise.
+
+        A process that makes no progress for longer than `stall_timeout` is handled the same way,
+        `ConversionStalled` being raised instead.
+
+        Parameters
+        -----------
+        arguments: String containing the arguments (inputs, outputs and options) for ffmpeg \n
+        on_progress: Same as `run_ffmpeg` \n
+        outputs: Full path of each file written by ffmpeg, removed if the process is cancelled \n
+        overwrite: Boolean indicating if the outputs are being overwritten. Default --> false \n
+
+        Returns
+        --------
+        Same as `run_ffmpeg`.
+    """
+
+    # Outputs that are safe to remove on cancellation, i.e. outputs written by this very process.
+    outputs = [file for file in outputs if overwrite or not isfile(file)]
+
+    start_time: float = perf_counter()
+    spawned: Optional[float] = None
+
+    process = await asyncio.create_subprocess_exec(
+        *ffmpeg_command(arguments),
+        stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT
+    )
+    output: FfmpegOutput = FfmpegOutput()
+
+    try:
+        while True:
+            try:
+                line = await asyncio.wait_for(process.stdout.readline(), stall_check_interval)
+            except asyncio.TimeoutError:
+                # Nothing written for a while, checked for a stall below.
+                line = None
+
+            if line and spawned is None:
+                spawned = perf_counter()
+                add_phase_time('spawn', spawned - start_time)
+
+            if output.stalled():
+                raise ConversionStalled(f'ffmpeg made no progress for '
+                                        f'{print_time(int(stall_timeout))}')
+            elif line is None:
+                continue
+            elif not line:
+                # Reaches here only when the process has ended. Breaking out of the loop.
+                break
+
+            progress = output.feed(line.decode(errors='replace').strip())
+            if progress is not None and on_progress:
+                on_progress(progress, output.duration)
+
+        exit_status: int = await process.wait()
+        add_phase_time('encode', perf_counter() - (spawned or start_time))
+
+        return exit_status == 0 and output.finished, output.media_infos(), output.last_message
+    except BaseException as error:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                # The process ended on its own in the meantime.
+                pass
+
+            # Not waiting for a stuck process to exit, a process stuck on a read might not exit
+            # until the read is over.
+            if not isinstance(error, ConversionStalled):
+                await asyncio.shield(process.wait())
+
+        remove_outputs(outputs)
+        raise
+
+
+def crc_table(polynomial: int, width: int) -> List[int]:
+    """
+        Builds the lookup table for a (non-reflected) CRC of the given polynomial and width.
+    """
+
+    table: List[int] = []
+    for byte in range(256):
+        crc: int = byte << (width - 8)
+        for _ in range(8):
+            crc = (crc << 1) ^ polynomial if crc & (1 << (width - 1)) else crc << 1
+        table.append(crc & ((1 << width) - 1))
+
+    return table
+
+
+# Lookup tables for the CRCs used by FLAC frames - CRC-8 for the frame header, CRC-16 for the
+# entire frame.
+crc8_table: List[int] = crc_table(0x07, 8)
+crc16_table: List[int] = crc_table(0x8005, 16)
+
+
+def flac_crc8(data: bytes) -> int:
+    """
+        Calculates the CRC-8 (polynomial 0x07) of the data, as used by FLAC frame headers.
+    """
+
+    crc: int = 0
+    for byte in data:
+        crc = crc8_table[crc ^ byte]
+
+    return crc
+
+
+def flac_crc16(data: bytes) -> int:
+    """
+        Calculates the CRC-16 (polynomial 0x8005) of the data, as used by FLAC frames.
+    """
+
+    crc: int = 0
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ crc16_table[(crc >> 8) ^ byte]
+
+    return crc
+
+
+def flac_crc16_shift(crc: int, length: int) -> int:
+    """
+        Returns the CRC-16 that a message would have if `length` zero bytes were appended to it,
+        given the CRC-16 of the message.
+
+        Remarks
+        --------
+        The CRC is linear, the CRC-16 of the concatenation of `a` and `b` is the CRC-16 of `a`
+        shifted by the length of `b`, XOR'd with the CRC-16 of `b`. This is used to fix the CRC-16
+        of a frame after its header has been changed, without reading the rest of the frame again.
+        The shift is a multiplication by x^(8 * length) modulo the polynomial, calculated in
+        logarithmic time.
+    """
+
+    def multiply(a: int, b: int) -> int:
+        # Multiplication of two polynomials modulo the CRC-16 polynomial.
+        result: int = 0
+        while b:
+            if b & 1:
+                result ^= a
+            b >>= 1
+            a <<= 1
+            if a & 0x10000:
+                a ^= 0x18005
+
+        return result
+
+    # x^8, raised to the power of `length`.
+    power: int = 1
+    base: int = 0x100
+    while length:
+        if length & 1:
+            power = multiply(power, base)
+        base = multiply(base, base)
+        length >>= 1
+
+    return multiply(crc, power)
+
+
+def encode_frame_number(number: int) -> bytes:
+    """
+        Encodes the number of a FLAC frame using the UTF-8 like coding used by frame headers.
+    """
+
+    if number < 0x80:
+        return bytes([number])
+
+    # Number of bytes required - each continuation byte holds 6 bits, the first byte holds the rest.
+    length: int = 2
+    while number >= 1 << (5 * length + 1):
+        length += 1
+
+    continuation: List[int] = []
+    for _ in range(length - 1):
+        continuation.insert(0, 0x80 | (number & 0x3F))
+        number >>= 6
+
+    return bytes([((0xFF << (8 - length)) & 0xFF) | number] + continuation)
+
+
+def parse_frame_header(data: Union[bytes, mmap], offset: int) -> Optional[Tuple[int, int, int]]:
+    """
+        Parses the header of a fixed block size FLAC frame.
+
+        Parameters
+        -----------
+        data: Bytes (or a memory-mapped file) containing the frame \n
+        offset: Offset of the first byte of the header \n
+
+        Returns
+        --------
+        A tuple containing the number of the frame, the length of the header (including its CRC-8),
+        and the length of the frame number inside the header. `None` if there is no valid header
+        at the offset - any sequence of bytes with an invalid CRC-8 is rejected.
+    """
+
+    header: bytes = bytes(data[offset:offset + 16])
+    if len(header) < 6 or header[0] != 0xFF or header[1] != 0xF8:
+        return None
+
+    block_size_code, sample_rate_code = header[2] >> 4, header[2] & 0x0F
+    if block_size_code == 0 or sample_rate_code == 0x0F or header[3] >> 4 > 10 or header[3] & 1:
+        return None
+
+    # Length of the frame number, given by the number of leading ones in its first byte.
+    first: int = header[4]
+    length: int = 1
+    if first & 0x80:
+        while length < 7 and first & (0x80 >> length):
+            length += 1
+        if length == 1 or length > 6:
+            return None
+
+    number: int = first & (0xFF >> (length + 1)) if length > 1 else first
+    for byte in header[5:4 + length]:
+        if byte & 0xC0 != 0x80:
+            return None
+        number = (number << 6) | (byte & 0x3F)
+
+    size: int = 4 + length
+    size += {6: 1, 7: 2}.get(block_size_code, 0)
+    size += {12: 1, 13: 2, 14: 2}.get(sample_rate_code, 0)
+
+    if len(header) <= size or flac_crc8(header[:size]) != header[size]:
+        return None
+
+    return number, size + 1, length
+
+
+def read_flac_metadata(data: Union[bytes, mmap]) -> Tuple[List[Tuple[int, bytes]], int]:
+    """
+        Reads the metadata blocks present at the beginning of a FLAC file.
+
+        Exceptions
+        -----------
+        ValueError: Thrown if the data does not start with a FLAC stream marker.
+
+        Returns
+        --------
+        A tuple containing the list of metadata blocks - each being a tuple of the type and the body
+        of the block, STREAMINFO being the first one - and the offset of the first frame.
+    """
+
+    if bytes(data[:4]) != b'fLaC':
+        raise ValueError('Not a FLAC file')
+
+    blocks: List[Tuple[int, bytes]] = []
+    offset: int = 4
+    last: bool = False
+
+    while not last:
+        last, block_type = bool(data[offset] & 0x80), data[offset] & 0x7F
+        length: int = int.from_bytes(data[offset + 1:offset + 4], 'big')
+        blocks.append((block_type, bytes(data[offset + 4:offset + 4 + length])))
+        offset += 4 + length
+
+    return blocks, offset
+
+
+def join_flac_segments(segments: List[str], flac_file: str) -> int:
+    """
+        Joins FLAC files encoded from consecutive segments of the same source into a single file.
+
+        Remarks
+        --------
+        The frames of each segment are copied as-is, only the number in the header of each frame is
+        changed to follow the frames of the previous segments - along with the CRC-8 of the header,
+        and the CRC-16 of the frame. The metadata blocks of the first segment are used for the file,
+        with the STREAMINFO block updated to cover all the segments.
+
+        The segments should have been encoded with the same fixed block size, and each segment
+        (except the last one) should contain a multiple of the block size samples - a FLAC stream
+        with a fixed block size can't have shorter frames anywhere but at the very end.
+
+        The MD5 of the audio can't be derived from the MD5 of each segment, the STREAMINFO block
+        written by this method contains a blank MD5. The offset of the MD5 is returned, to be filled
+        in once it has been calculated.
+
+        Parameters
+        -----------
+        segments: List containing the full path of each segment, in order \n
+        flac_file: Full path of the FLAC file to be written \n
+
+        Exceptions
+        -----------
+        ValueError: Thrown if a segment is not a valid FLAC file, or if the segments can't be joined.
+
+        Returns
+        --------
+        Integer containing the offset of the MD5 inside the file written.
+    """
+
+    metadata: List[Tuple[int, bytes]] = []
+    total_samples: int = 0
+    frame_offset: int = 0
+    min_frame, max_frame = 1 << 24, 0
+
+    with open(flac_file, 'wb') as output:
+        for index in range(len(segments)):
+            with open(segments[index], 'rb') as file, \
+                    mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+                blocks, position = read_flac_metadata(data)
+                streaminfo: bytes = blocks[0][1]
+
+                if index == 0:
+                    # Placeholder for the metadata blocks, rewritten once all the frames are in.
+                    # Seek tables are dropped, the offsets in a seek table of the first segment
+                    # would be meaningless for the whole file.
+                    metadata = [block for block in blocks if block[0] != 3]
+                    output.write(b'fLaC' + b''.join(
+                        bytes(4) + block[1] for block in metadata))
+                    block_size: int = int.from_bytes(streaminfo[2:4], 'big')
+                elif int.from_bytes(streaminfo[10:18], 'big') >> 36 != \
+                        int.from_bytes(metadata[0][1][10:18], 'big') >> 36:
+                    raise ValueError(f'Segment {index} does not match the format of the first')
+
+                samples: int = int.from_bytes(streaminfo[10:18], 'big') & ((1 << 36) - 1)
+                if index < len(segments) - 1 and samples % block_size:
+                    raise ValueError(f'Segment {index} is not a multiple of the block size')
+
+                header = parse_frame_header(data, position)
+                number: int = 0
+                while header is not None:
+                    if header[0] != number:
+                        raise ValueError(f'Unexpected frame {header[0]} in segment {index}')
+
+                    # The frame ends where the header of the next frame begins. Any sync code
+                    # inside the audio data is rejected by the CRC-8 and the frame number check.
+                    end: int = position + header[1]
+                    following = None
+                    while following is None:
+                        end = data.find(b'\xff\xf8', end + 1)
+                        if end == -1:
+                            end = len(data)
+                            break
+
+                        following = parse_frame_header(data, end)
+                        if following is not None and following[0] != number + 1:
+                            following = None
+
+                    frame_size: int = end - position
+                    if frame_offset == 0:
+                        output.write(data[position:end])
+                    else:
+                        old_header: bytes = bytes(data[position:position + header[1]])
+                        new_header: bytes = old_header[:4] + \
+                            encode_frame_number(number + frame_offset) + \
+                            old_header[4 + header[2]:-1]
+                        new_header += bytes([flac_crc8(new_header)])
+
+                        # The header changed, correcting the CRC-16 by the difference between the
+                        # CRCs of the old and the new header - shifted by the rest of the frame.
+                        rest: int = end - 2 - position - header[1]
+                        crc: int = int.from_bytes(data[end - 2:end], 'big') ^ flac_crc16_shift(
+                            flac_crc16(old_header) ^ flac_crc16(new_header), rest)
+
+                        output.write(new_header)
+                        output.write(data[position + header[1]:end - 2])
+                        output.write(crc.to_bytes(2, 'big'))
+                        frame_size += len(new_header) - len(old_header)
+
+                    min_frame, max_frame = min(min_frame, frame_size), max(max_frame, frame_size)
+                    position, header, number = end, following, number + 1
+
+                total_samples += samples
+                frame_offset += number
+
+        # Updating the STREAMINFO block - frame sizes, total number of samples and a blank MD5.
+        streaminfo: bytes = metadata[0][1]
+        details: int = int.from_bytes(streaminfo[10:18], 'big') & ~((1 << 36) - 1) | total_samples
+        metadata[0] = (0, streaminfo[:4] + min_frame.to_bytes(3, 'big') +
+                       max_frame.to_bytes(3, 'big') + details.to_bytes(8, 'big') + bytes(16))
+
+        output.seek(4)
+        for index in range(len(metadata)):
+            block_type, body = metadata[index]
+            last: int = 0x80 if index == len(metadata) - 1 else 0
+            output.write(bytes([last | block_type]) + len(body).to_bytes(3, 'big') + body)
+
+    # 'fLaC', the header of the STREAMINFO block and the first 18 bytes of the block.
+    return 4 + 4 + 18
+
+
+def segment_layout(total_samples: int, count: int) -> Tuple[int, int]:
+    """
+        Splits a source into segments encoded at the same time.
+
+        Remarks
+        --------
+        Each segment holds a multiple of `segment_block_size` samples, the last one holding what is
+        left. Sources too short to fill `count` segments get fewer segments, so that no segment
+        but the last one holds less than a full range - the segments could not be joined otherwise.
+
+        Parameters
+        -----------
+        total_samples: Number of samples in the source \n
+        count: Maximum number of segments \n
+
+        Returns
+        --------
+        Tuple containing the number of samples in each segment, and the number of segments.
+    """
+
+    length: int = max(ceil(total_samples / count / segment_block_size), 1) * segment_block_size
+    return length, max(min(count, ceil(total_samples / length)), 1)
+
+
+def segment_stream(info: MediaInfo, stream_map: str) -> AudioStream:
+    """
+        Returns the details of the stream selected by a `-map` option (see `audio_stream_maps`),
+        the first stream if the option is empty and ffmpeg picks the stream.
+    """
+
+    stream_index: int = int(stream_map.rpartition(':')[-1]) if stream_map else 0
+    return info.streams[min(stream_index, len(info.streams) - 1)]
+
+
+def generate_segmented_flac_file(original_file: str, flac_file: str, info: MediaInfo, *,
+                                 stream_map: str = '', overwrite: bool = False,
+                                 show_progress: bool = True
+                                 ) -> Optional[Tuple[bool, List[str], float]]:
+    """
+        Generates the flac file for a long source by splitting it into segments that are encoded at
+        the same time, and then joining the segments.
+
+        Remarks
+        --------
+        The source is split into up to `jobs` segments, each segment covering a sample-accurate
+        range of the source - a multiple of the block size of the encoder, the last segment running
+        till the end of the source. Short sources get fewer segments, so that only the last segment
+        can hold less than a full range. Each range is cut out with the `atrim` filter, which
+        counts samples and not timestamps, once ffmpeg has seeked straight to the (whole) second
+        the segment begins in. The source should be PCM, which is seekable to the exact sample -
+        seeking inside a compressed stream is not guaranteed to be sample accurate, each segment
+        would have to decode the source from the beginning.
+
+        The worker converting the file encodes the first segment, the other segments are encoded
+        by the workers that are idle (see `idle_workers`) - they are borrowed till the segments are
+        encoded. The file is not segmented if no worker is idle.
+
+        The segments are joined by `join_flac_segments`, the MD5 of the audio in STREAMINFO is then
+        calculated by decoding the joined file. The decoded audio is identical to the one of a
+        single-pass encode, FLAC being lossless. The duration reported for some sources (VBR mp3
+        files for instance) is an estimate, a segment can then end up short or empty - making the
+        segments impossible to encode or to join. The source is then to be converted in a single
+        pass instead.
+
+        Parameters
+        -----------
+        original_file: Full file path of the original file which is to be converted to flac \n
+        flac_file: Full path of the flac file to be generated \n
+        info: Details of the original file, as returned by `probe_file` \n
+        stream_map: `-map` option selecting the audio track, empty to let ffmpeg pick it \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+        show_progress: Boolean indicating if the progress bar is to be drawn. Default --> true \n
+
+        Returns
+        --------
+        Same as `generate_flac_file`, or None if no worker is idle, or if the segments could not
+        be encoded or joined - the source is then to be converted in a single pass.
+    """
+
+    if isfile(flac_file) and not overwrite:
+        raise OutputExists(flac_file)
+
+    sample_rate: int = segment_stream(info, stream_map).sample_rate
+    total_samples: int = ceil(info.duration * sample_rate)
+
+    # Borrowing the idle workers, one for each segment but the first.
+    borrowed: int = jobs - 1
+    if idle_workers is not None:
+        borrowed = 0
+        while borrowed < segment_layout(total_samples, jobs)[1] - 1 and \
+                idle_workers.acquire(blocking=False):
+            borrowed += 1
+
+        if not borrowed:
+            return None
+
+    # Number of samples in each segment, rounded up to a multiple of the block size. The duration
+    # is only used to split the source evenly, the last segment runs till the end either way.
+    length, count = segment_layout(total_samples, borrowed + 1)
+    if idle_workers is not None:
+        # Handing back the workers left over, when the source is too short for all of them.
+        for _ in range(borrowed - (count - 1)):
+            idle_workers.release()
+        borrowed = count - 1
+
+    directory, file_name = path.split(flac_file)
+    segments: List[str] = [join(directory, f'.{file_name}.segment{i}.flac') for i in range(count)]
+
+    # The segments are joined into the partial flac file, see `partial_path`.
+    partial: str = partial_path(flac_file)
+
+    # Amount of media converted by each segment, used to draw the progress of the whole file.
+    processed: List[float] = [0.0] * count
+    lock: Lock = Lock()
+    start_time: int = int(time())
+
+    def encode(index: int) -> Tuple[bool, Optional[float], str]:
+        start: int = index * length
+        seek: int = start // sample_rate
+
+        trim: str = f'start_sample={start - seek * sample_rate}'
+        if index < count - 1:
+            trim += f':end_sample={start + length - seek * sample_rate}'
+
+        # The timestamps start from zero within each segment, adding up to the amount converted.
+        trim += ',asetpts=PTS-STARTPTS'
+
+        def on_progress(progress: ConversionProgress, _: Optional[float]) -> None:
+            processed[index] = progress.out_time
+            report_progress(original_file, min(sum(processed), info.duration), info.duration)
+            if show_progress:
+                with lock:
+                    animated_progress(min(sum(processed), info.duration), info.duration,
+                                      int(time()) - start_time)
+
+        return run_ffmpeg([*(['-ss', str(seek)] if seek else []), '-i', original_file, '-vn', '-sn',
+                           '-dn', *stream_map.split(), '-af', f'atrim={trim}', '-c:a', 'flac',
+                           '-frame_size', str(segment_block_size), segments[index], '-y'],
+                          on_progress=on_progress, outputs=[segments[index]], overwrite=True)
+
+    try:
+        # The phases are not recorded by the threads encoding the segments, the encoding is timed
+        # as a whole instead - and so is the joining of the segments.
+        with timed('encode'), ThreadPoolExecutor(max_workers=count) as pool:
+            results = list(pool.map(encode, range(count)))
+
+        for finished, _, last_message in results:
+            if not finished:
+                # A segment starting past the actual end of the source fails as well.
+                print(f'\n\tffmpeg failed to convert a segment of "{original_file}" '
+                      f'({last_message}), converting it in a single pass')
+                return None
+
+        write_start: float = perf_counter()
+        md5_offset: int = join_flac_segments(segments, partial)
+
+        # The MD5 is calculated over the samples as stored in the file - signed, little-endian,
+        # using as many bytes as required by the bits per sample.
+        with open(partial, 'rb') as file:
+            file.seek(md5_offset - 18 + 12)
+            bits: int = ((int.from_bytes(file.read(2), 'big') >> 4) & 0x1F) + 1
+        codec: str = 'pcm_s8' if bits <= 8 else f'pcm_s{ceil(bits / 8) * 8}le'
+
+        thread = popen_spawn.PopenSpawn(f'{process_name} -nostdin -v error -i "{partial}" '
+                                        f'-map 0:a -c:a {codec} -f md5 -')
+        md5 = search(r'MD5=([0-9a-f]{32})', thread.read().decode(errors='replace'))
+        thread.wait()
+
+        if not md5:
+            print(f'\n\tFailed to calculate the MD5 of "{flac_file}"')
+            remove(partial)
+            return False, [], info.duration
+
+        with open(partial, 'r+b') as file:
+            file.seek(md5_offset)
+            file.write(bytes.fromhex(md5.group(1)))
+
+        add_phase_time('write', perf_counter() - write_start)
+        finalize_outputs([flac_file])
+    except ValueError as error:
+        print(f'\n\tFailed to join the segments of "{original_file}" ({error}), converting it in '
+              f'a single pass')
+        remove_outputs([partial])
+        return None
+    except OSError as error:
+        print(f'\n\tFailed to join the segments of "{original_file}": {error}')
+        remove_outputs([partial])
+        return False, [], info.duration
+    finally:
+        for segment in segments:
+            if isfile(segment):
+                remove(segment)
+
+        if idle_workers is not None:
+            for _ in range(borrowed):
+                idle_workers.release()
+
+    return True, [flac_file], info.duration
+
+
+def native_supported(original_file: str) -> bool:
+    """
+        Checks if a file can be encoded in-process, see `native_files`.
+    """
+
+    if soundfile is None or original_file.rpartition('.')[-1] not in native_files:
+        return False
+
+    try:
+        return soundfile.info(original_file).subtype in ['PCM_16', 'PCM_24']
+    except (RuntimeError, OSError):
+        # Files that libsndfile can't read are left to ffmpeg.
+        return False
+
+
+def generate_native_flac_file(original_file: str, flac_file: str, *, overwrite: bool = False,
+                              show_progress: bool = True) -> Tuple[bool, List[str], float]:
+    """
+        Generates the flac file for a PCM wav file in-process using libsndfile (through
+        `soundfile`), without firing ffmpeg.
+
+        Remarks
+        --------
+        The samples are read in chunks of `native_chunk_size` and written to the flac file as-is,
+        using the same bits per sample as the source - the audio is identical, sample for sample, to
+        the one of a flac file generated by ffmpeg. Like ffmpeg, the samples are written to the
+        partial path of the flac file (see `partial_path`).
+
+        Parameters
+        -----------
+        original_file: Full file path of the wav file \n
+        flac_file: Full path of the flac file to be generated \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+        show_progress: Boolean indicating if the progress bar is to be drawn. Default --> true \n
+
+        Returns
+        --------
+        Same as `generate_flac_file`.
+    """
+
+    if isfile(flac_file) and not overwrite:
+        raise OutputExists(flac_file)
+
+    start_time: int = int(time())
+    duration: float = 0.0
+
+    try:
+        with timed('encode'), soundfile.SoundFile(original_file) as source:
+            duration = source.frames / source.samplerate
+
+            # 16 bit samples are read as they are, 24 bit samples are read as 32 bit integers -
+            # libsndfile scales them back while writing, no sample is altered either way.
+            dtype: str = 'int16' if source.subtype == 'PCM_16' else 'int32'
+
+            with soundfile.SoundFile(partial_path(flac_file), 'w', samplerate=source.samplerate,
+                                     channels=source.channels, format='FLAC',
+                                     subtype=source.subtype) as output:
+                processed: int = 0
+                for chunk in source.blocks(blocksize=native_chunk_size, dtype=dtype,
+                                           always_2d=True):
+                    output.write(chunk)
+                    processed += len(chunk)
+
+                    report_progress(original_file, min(processed / source.samplerate, duration),
+                                    duration)
+                    if show_progress:
+                        animated_progress(min(processed / source.samplerate, duration),
+                                          duration or False, int(time()) - start_time)
+
+        finalize_outputs([flac_file])
+    except (RuntimeError, OSError) as error:
+        print(f'\n\tFailed to convert "{original_file}": {error}')
+        remove_outputs([partial_path(flac_file)])
+        return False, [], duration
+
+    return True, [flac_file], duration
+
+
+def flac_path(original_file: str) -> str:
+    """
+        Returns the full path of the flac file generated for a file - the flac file is saved in the
+        same directory as the original file, with the same name.
+    """
+
+    # Getting the directory in which the original file is stored, creating a new path for the flac
+    # file using this location.
+    directory, file_name = path.split(original_file)
+    return join(directory, file_name.rpartition('.')[0]) + '.flac'
+
+
+def partial_path(flac_file: str) -> str:
+    """
+        Returns the path a flac file is written to while it is being generated.
+
+        Remarks
+        --------
+        The flac file is renamed to its final path once it is complete - the rename is atomic, if
+        the script dies midway, the flac file left behind is a hidden partial file, never one that
+        looks valid.
+    """
+
+    directory, file_name = path.split(flac_file)
+    return join(directory, f'.{file_name}.partial.flac')
+
+
+def finalize_outputs(flac_files: List[str]) -> None:
+    """
+        Moves complete flac files from their partial path (see `partial_path`) to their final path.
+    """
+
+    with timed('write'):
+        for flac_file in flac_files:
+            replace(partial_path(flac_file), flac_file)
+
+
+def generate_flac_file(original_file: str, *, overwrite: bool = False,
+                       show_progress: bool = True) -> Tuple[bool, List[str], float]:
+    """
+        Will generate the flac file and save it in the destination directory as required.
+
+        Remarks
+        --------
+        Take in the original file that is to be converted into a flac file, use ffmpeg in the
+        backend to generate a flac file with the same name as the original and save the file in the
+        same directory as the original file.
+
+        This function handles the most important task of this script, it also has the highest
+        probability of an unexpected failure/crash.
+
+        *Realizes that deleting this method will leave bug-free code*
+
+        (╯°□°）╯︵ ┻━┻
+
+        Exceptions
+        -----------
+        OSError.FileNotFoundError: Path supplied for the original file is invalid or it points to
+        a directory instead of a file.
+
+        OutputExists: The flac file exists already, and is not to be overwritten.
+
+        Parameters
+        -----------
+        original_file: Full file path of the original file which is to be converted to flac \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+        show_progress: Boolean indicating if the progress bar is to be drawn while the file is being
+        converted. Should be false when multiple files are converted at the same time, the progress
+        bars would overwrite each other otherwise. Default --> true \n
+
+        Returns
+        --------
+        A tuple containing a boolean, a list and a float. The value of the boolean is true if the
+        flac file is generated successfully, false in case of any error.
+
+        If any error occurs, the message will be printed directly to the screen by this method,
+        the part of returning the error message to the calling function is not required.
+
+        If the value of the boolean is true, the list will contain the full path of the flac
+        file generated - or the full path of each flac file generated, if every audio track of a
+        video file is extracted into its own file. In case if the value of the boolean is false,
+        the list will be empty.
+
+        The float contains the duration of the audio (in seconds) as reported by ffmpeg, zero if
+        the duration could not be detected.
+    """
+
+    if not isfile(original_file):
+        raise FileNotFoundError(f'No file found at the path "{original_file}"')
+
+    global process_name
+
+    # Path of the flac file - in the same directory, and with the same name, as the original file.
+    file_name: str = path.basename(original_file)
+    flac_file: str = flac_path(original_file)
+
+    # `-map` option(s) selecting the audio track(s) to be converted, ffmpeg picks the track on its
+    # own for audio files.
+    video: bool = file_name.rpartition('.')[-1] in video_files
+    maps: List[str] = audio_stream_maps(original_file.strip()) if video else ['']
+
+    if segment_threshold > 0 and jobs > 1 and len(maps) == 1:
+        # Files longer than the threshold are split into segments encoded at the same time.
+        info: MediaInfo = probe_file(original_file.strip())
+        # Only PCM sources are segmented, see `generate_segmented_flac_file`.
+        if info.duration and info.duration > segment_threshold and info.streams and \
+                all(stream.sample_rate for stream in info.streams) and \
+                segment_stream(info, maps[0]).codec.startswith('pcm_'):
+            result = generate_segmented_flac_file(original_file.strip(), flac_file.strip(), info,
+                                                  stream_map=maps[0], overwrite=overwrite,
+                                                  show_progress=show_progress)
+            # Segments that could not be encoded or joined fall back to a single-pass encode.
+            if result is not None:
+                return result
+
+    if native_supported(original_file.strip()):
+        # PCM wav files are encoded in-process, there is no need to fire ffmpeg for them.
+        return generate_native_flac_file(original_file.strip(), flac_file.strip(),
+                                         overwrite=overwrite, show_progress=show_progress)
+
+    # Arguments for ffmpeg, along with the full path of each flac file generated.
+    arguments, flac_files = conversion_arguments(original_file, flac_file, maps)
+
+    existing: List[str] = [file for file in flac_files if isfile(file)]
+    if existing and not overwrite:
+        raise OutputExists(existing[0])
+
+    # Getting the start time before firing the process.
+    start_time: int = int(time())
+
+    def on_progress(progress: ConversionProgress, duration: Optional[float]) -> None:
+        # The position reported can be a tad beyond the duration in the header, clamping it.
+        media_time: float = progress.out_time if duration is None else min(progress.out_time,
+                                                                           duration)
+        report_progress(original_file, media_time, duration)
+        if show_progress:
+            animated_progress(media_time, duration or False, int(time()) - start_time)
+
+    # Creating a process that uses ffmpeg along the with the parameters to generate a flac file.
+    finished, media_infos, last_message = run_ffmpeg(
+        arguments, on_progress=on_progress,
+        outputs=[partial_path(file) for file in flac_files], overwrite=True
+    )
+
+    return conversion_outcome(original_file, flac_files, finished, media_infos, last_message)
+
+
+async def generate_flac_file_async(original_file: str, *,
+                                   overwrite: bool = False) -> Tuple[bool, List[str], float]:
+    """
+        Counterpart of `generate_flac_file` for the `async` engine.
+
+        Remarks
+        --------
+        Every file is converted by a single ffmpeg process - segmented encoding, in-process
+        encoding and groups of short files are left to the `threads` engine, each of them relies
+        on worker threads of its own.
+
+        Probing a video file for its audio tracks (only needed when the tracks are selected by
+        language, or all of them are extracted) is done from the default executor of the loop.
+
+        Exceptions
+        -----------
+        OSError.FileNotFoundError: Path supplied for the original file is invalid or it points to
+        a directory instead of a file.
+
+        Returns
+        --------
+        Same as `generate_flac_file`.
+    """
+
+    if not isfile(original_file):
+        raise FileNotFoundError(f'No file found at the path "{original_file}"')
+
+    flac_file: str = flac_path(original_file)
+
+    maps: List[str] = ['']
+    if path.basename(original_file).rpartition('.')[-1] in video_files:
+        # Running inside a copy of the context, the time spent probing is added to the phases
+        # of the file.
+        maps = await asyncio.get_running_loop().run_in_executor(
+            None, copy_context().run, audio_stream_maps, original_file.strip()
+        )
+
+    arguments, flac_files = conversion_arguments(original_file, flac_file, maps)
+
+    existing: List[str] = [file for file in flac_files if isfile(file)]
+    if existing and not overwrite:
+        raise OutputExists(existing[0])
+
+    def on_progress(progress: ConversionProgress, duration: Optional[float]) -> None:
+        report_progress(original_file, progress.out_time if duration is None
+                        else min(progress.out_time, duration), duration)
+
+    finished, media_infos, last_message = await run_ffmpeg_async(
+        arguments, on_progress=on_progress,
+        outputs=[partial_path(file) for file in flac_files], overwrite=True
+    )
+
+    return conversion_outcome(original_file, flac_files, finished, media_infos, last_message)
+
+
+def conversion_arguments(original_file: str, flac_file: str,
+                         maps: List[str]) -> Tuple[List[str], List[str]]:
+    """
+        Builds the arguments used to convert a file with a single ffmpeg process.
+
+        Remarks
+        --------
+        ffmpeg writes to the partial path of each flac file (see `partial_path`), and always
+        overwrites it - a partial file can only be left behind by an earlier run that was
+        interrupted. Whether the flac file itself can be overwritten is up to the caller to check.
+
+        Parameters
+        -----------
+        original_file: Full file path of the original file which is to be converted to flac \n
+        flac_file: Full path of the flac file to be generated \n
+        maps: List of `-map` options as returned by `audio_stream_maps` \n
+
+        Returns
+        --------
+        A tuple containing the arguments for ffmpeg, and a list containing the full path of each
+        flac file that will be generated.
+    """
+
+    # For video files, only the audio is extracted from the container.
+    if original_file.rpartition('.')[-1] in video_files:
+        arguments, flac_files = audio_only_arguments(flac_file.strip(), maps)
+    else:
+        arguments, flac_files = ['-c:a', 'flac', partial_path(flac_file.strip())], [flac_file]
+
+    return ['-i', original_file.strip(), *arguments, '-y'], flac_files
+
+
+def conversion_outcome(original_file: str, flac_files: List[str], finished: bool,
+                       media_infos: List[MediaInfo],
+                       last_message: str) -> Tuple[bool, List[str], float]:
+    """
+        Checks the outcome of the ffmpeg process converting a file, printing the reason if the
+        conversion failed.
+
+        Remarks
+        --------
+        The details of the file come for free with the conversion, they are saved to the metadata
+        cache for the next run.
+
+        The flac file(s) are moved to their final path if ffmpeg succeeded, and the partial file(s)
+        are removed otherwise.
+
+        Parameters
+        -----------
+        original_file: Full file path of the original file \n
+        flac_files: Full path of each flac file that should have been generated \n
+        finished, media_infos, last_message: Values returned by `run_ffmpeg` \n
+
+        Returns
+        --------
+        Same as `generate_flac_file`.
+    """
+
+    media_info: MediaInfo = media_infos[0] if media_infos else MediaInfo(None, [])
+    duration: Optional[float] = media_info.duration
+
+    if media_info.streams and get_cached_info(original_file) is None:
+        cache_info(original_file, media_info)
+
+    # The output is written completely once the process exits, checking if ffmpeg succeeded.
+    if not finished or not all(isfile(partial_path(file)) for file in flac_files):
+        print(f'\n\tffmpeg failed to convert "{original_file}": {last_message}')
+        remove_outputs(map(partial_path, flac_files))
+        return False, [], duration or 0.0
+
+    finalize_outputs(flac_files)
+    return True, flac_files, duration or 0.0
+
+
+class ConversionResult(NamedTuple):
+    """
+        Outcome of the conversion of a single source file.
+    """
+
+    # Full path of the source file.
+    source: str
+
+    # True if the flac file was generated successfully.
+    success: bool
+
+    # Full path of each flac file generated, empty if the conversion failed.
+    flac_files: List[str]
+
+    # Duration of the audio (in seconds), zero if it could not be detected.
+    duration: float
+
+    # Amount of (wall-clock) seconds spent on the conversion.
+    seconds: float
+
+    # True if ffmpeg got stuck on every attempt to convert the file, see `retry_count`.
+    quarantined: bool = False
+
+    # Time spent (in seconds) in each phase of the conversion, see `phase_times`.
+    phases: Optional[Dict[str, float]] = None
+
+    # True if the file was not converted as its flac file exists already, see `OutputExists`.
+    skipped: bool = False
+
+    @property
+    def failed(self) -> bool:
+        """
+            True if the file failed to convert - a file that was skipped did not fail.
+        """
+
+        return not self.success and not self.skipped
+
+    @property
+    def state(self) -> str:
+        """
+            State of the file, as recorded in the journal (and the shared queue).
+        """
+
+        return 'failed' if self.failed else 'done'
+
+
+def convert_file(original_file: str, *, overwrite: bool = False,
+                 show_progress: bool = True) -> ConversionResult:
+    """
+        Wrapper around `generate_flac_file` meant to be used as the job run by a worker thread.
+
+        Remarks
+        --------
+        Any exception raised while converting the file is caught and printed here, a single
+        file failing to convert should not bring down the entire batch.
+
+        If ffmpeg gets stuck, the conversion is retried up to `retry_count` times, waiting a little
+        longer before each retry (see `retry_backoff`) - a network share having a bad moment might
+        be fine a few seconds later. The file is quarantined if ffmpeg gets stuck on every attempt.
+
+        Parameters
+        -----------
+        original_file: Full file path of the original file which is to be converted to flac \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+        show_progress: Boolean indicating if the progress bar is to be drawn. Default --> true \n
+
+        Returns
+        --------
+        `ConversionResult` containing the values returned by `generate_flac_file`, along with the
+        amount of (wall-clock) seconds spent on the conversion.
+    """
+
+    start_time: float = time()
+    quarantined: bool = False
+    skipped: bool = False
+
+    # Collecting the time spent in each phase, across all the attempts.
+    phases: Dict[str, float] = {}
+    token = phase_times.set(phases)
+
+    overwrite = overwrite or original_file in stale_sources
+
+    for attempt in range(retry_count + 1):
+        try:
+            result, flac_files, duration = generate_flac_file(original_file, overwrite=overwrite,
+                                                              show_progress=show_progress)
+        except ConversionStalled as error:
+            result, flac_files, duration = False, [], 0.0
+
+            if attempt < retry_count:
+                delay: float = retry_backoff * 2 ** attempt
+                print(f'\n\tConversion of "{original_file}" stalled ({error}), retrying in '
+                      f'{print_time(int(delay))}')
+                sleep(delay)
+                continue
+
+            print(f'\n\tConversion of "{original_file}" stalled on {attempt + 1} attempts, '
+                  f'quarantining the file')
+            quarantined = True
+        except OutputExists as error:
+            print(f'\n\tNot overwriting "{error}"')
+            result, flac_files, duration, skipped = False, [], 0.0, True
+        except Exception as error:
+            print(f'\n\tFailed to convert "{original_file}": {error!r}')
+            result, flac_files, duration = False, [], 0.0
+
+        break
+
+    phase_times.reset(token)
+    return ConversionResult(original_file, result, flac_files, duration, time() - start_time,
+                            quarantined, phases, skipped)
+
+
+async def convert_file_async(original_file: str, *, overwrite: bool = False) -> ConversionResult:
+    """
+        Counterpart of `convert_file` for the `async` engine.
+
+        Remarks
+        --------
+        The conversion is cancelled if it runs for longer than `job_timeout`, the file is then
+        reported as failed - its partial flac file is removed by `run_ffmpeg_async`. Each retry of
+        a conversion that stalled (see `convert_file`) gets a timeout of its own.
+
+        Returns
+        --------
+        Same as `convert_file`.
+    """
+
+    start_time: float = time()
+    quarantined: bool = False
+    skipped: bool = False
+
+    # Collecting the time spent in each phase, across all the attempts.
+    phases: Dict[str, float] = {}
+    token = phase_times.set(phases)
+
+    overwrite = overwrite or original_file in stale_sources
+
+    for attempt in range(retry_count + 1):
+        try:
+            result, flac_files, duration = await asyncio.wait_for(
+                generate_flac_file_async(original_file, overwrite=overwrite), job_timeout or None
+            )
+        except ConversionStalled as error:
+            result, flac_files, duration = False, [], 0.0
+
+            if attempt < retry_count:
+                delay: float = retry_backoff * 2 ** attempt
+                print(f'\n\tConversion of "{original_file}" stalled ({error}), retrying in '
+                      f'{print_time(int(delay))}')
+                await asyncio.sleep(delay)
+                continue
+
+            print(f'\n\tConversion of "{original_file}" stalled on {attempt + 1} attempts, '
+                  f'quarantining the file')
+            quarantined = True
+        except OutputExists as error:
+            print(f'\n\tNot overwriting "{error}"')
+            result, flac_files, duration, skipped = False, [], 0.0, True
+        except asyncio.TimeoutError:
+            print(f'\n\tConversion of "{original_file}" cancelled, took longer than '
+                  f'{print_time(int(job_timeout))}')
+            result, flac_files, duration = False, [], 0.0
+        except Exception as error:
+            print(f'\n\tFailed to convert "{original_file}": {error!r}')
+            result, flac_files, duration = False, [], 0.0
+
+        break
+
+    phase_times.reset(token)
+    return ConversionResult(original_file, result, flac_files, duration, time() - start_time,
+                            quarantined, phases, skipped)
+
+
+async def convert_files_async(sources: Iterable[str], *, overwrite: bool = False,
+                              worker_count: int = 1) -> List[ConversionResult]:
+    """
+        Counterpart of `convert_files` for the `async` engine, converts all the files in the
+        iterable, running up to `worker_count` conversions at the same time.
+
+        Remarks
+        --------
+        All the ffmpeg processes are driven by a single event loop - no matter how many files are
+        being converted, there is no thread waiting on each of them. A semaphore limits the number
+        of conversions running at the same time, a source is only pulled from the iterable once a
+        conversion is over. Pulling a source can block - walking the directories, waiting for a
+        lease in shared mode, probing the duration of the source - it is done on a thread, the
+        conversions running in the meantime are not held up.
+
+        If the coroutine is cancelled (Ctrl-C cancels it when run through `asyncio.run`), every
+        conversion still running is cancelled, and its partial flac file removed, before the
+        cancellation is passed on.
+
+        The progress of the conversions is shown by a `ProgressBoard`, the same way as
+        `convert_files` does with more than one worker - even if there is a single worker.
+
+        Returns
+        --------
+        Same as `convert_files`.
+    """
+
+    print(f'\nConverting files using {worker_count} workers (async)')
+
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(worker_count)
+
+    # Results of the conversions mapped to the index of the source, used to keep them in order.
+    finished: Dict[int, ConversionResult] = {}
+
+    # Conversions that are running, removed from the set as soon as they are done.
+    running: Set[asyncio.Future] = set()
+
+    async def convert(index: int, source: str) -> None:
+        record_job(source, 'running')
+        board.start(source)
+
+        try:
+            finished[index] = await convert_file_async(source, overwrite=overwrite)
+        finally:
+            semaphore.release()
+
+        board.finish(source, finished[index].duration)
+        release_source(source, finished[index].state)
+
+        status: str = 'Finished' if finished[index].success else \
+            'Skipped' if finished[index].skipped else 'Failed'
+        record_job(source, finished[index].state)
+
+        # The conversion calling this is still part of `running`.
+        print(f'({len(finished)}/{len(finished) + len(running) - 1}) {status} file: '
+              f'{path.basename(source)}')
+
+    with ProgressBoard() as board:
+        if isinstance(sources, list):
+            for source in sources:
+                board.queue(source)
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        iterator: Iterator[str] = iter(sources)
+        index: int = 0
+
+        try:
+            while True:
+                # Waiting for a conversion to be over before pulling more sources from the iterable.
+                await semaphore.acquire()
+                source: Optional[str] = await loop.run_in_executor(None, next, iterator, None)
+                if source is None:
+                    semaphore.release()
+                    break
+
+                await loop.run_in_executor(None, board.queue, source)
+
+                future: asyncio.Future = asyncio.ensure_future(convert(index, source))
+                future.add_done_callback(running.discard)
+                running.add(future)
+                index += 1
+
+            await asyncio.gather(*running)
+        except BaseException:
+            for future in running:
+                future.cancel()
+
+            await asyncio.gather(*running, return_exceptions=True)
+            raise
+
+    return [finished[index] for index in sorted(finished)]
+
+
+def groupable(source: str, *, overwrite: bool = False) -> bool:
+    """
+        Checks if a file is short enough to be converted along with other short files by a single
+        ffmpeg process, see `group_threshold`.
+
+        Remarks
+        --------
+        Only audio files that are not encoded in-process are grouped. A file whose flac file exists
+        (and is not to be overwritten) is left out - ffmpeg would refuse to convert the entire
+        group otherwise.
+    """
+
+    if group_threshold <= 0 or source.rpartition('.')[-1] not in audio_files:
+        return False
+    elif not overwrite and source not in stale_sources and isfile(flac_path(source)):
+        return False
+
+    return estimate_duration(source) < group_threshold and not native_supported(source)
+
+
+def group_sources(sources: Iterable[str], *,
+                  overwrite: bool = False) -> Iterator[List[Tuple[int, str]]]:
+    """
+        Generator grouping short files (see `groupable`) into lists of up to `group_size` files,
+        each list to be converted by a single ffmpeg process. Every other file is yielded in a list
+        of its own.
+
+        Returns
+        --------
+        Each file is yielded along with its index in `sources`, used to report the results in the
+        same order as the files were produced by `sources`.
+    """
+
+    group: List[Tuple[int, str]] = []
+
+    for index, source in enumerate(sources):
+        if not groupable(source, overwrite=overwrite):
+            yield [(index, source)]
+            continue
+
+        group.append((index, source))
+        if len(group) >= group_size:
+            yield group
+            group = []
+
+    if group:
+        yield group
+
+
+def convert_group(sources: List[str], *, overwrite: bool = False) -> List[ConversionResult]:
+    """
+        Converts multiple files using a single ffmpeg process, one input and one output per file.
+
+        Remarks
+        --------
+        For short files, starting ffmpeg (and initializing the codecs) takes far longer than the
+        conversion itself - converting the files of a group in one go spreads this cost across the
+        group.
+
+        A single input that can't be converted makes ffmpeg fail for the entire group. If that
+        happens, the partial flac files of the group are removed, and the files are converted one
+        at a time instead - the failure is then reported for the files that caused it, and only
+        for them. A flac file that can't be moved into place once the group is converted (see
+        `finalize_outputs`) is converted again on its own, the same way.
+
+        The outputs are written side by side, the position reported by ffmpeg is reported as the
+        progress of every file of the group - up to its (estimated) duration.
+
+        Returns
+        --------
+        A list containing the result for each file, in the same order as `sources`. The time spent
+        by ffmpeg is split evenly across the files.
+    """
+
+    start_time: float = time()
+    flac_files: List[str] = [flac_path(source) for source in sources]
+
+    partials: List[str] = [partial_path(flac_file) for flac_file in flac_files]
+
+    arguments: List[str] = [argument for source in sources for argument in ['-i', source]] + [
+        argument for i in range(len(sources))
+        for argument in ['-map', f'{i}:a:0', '-c:a', 'flac', partials[i]]]
+
+    # Time spent in each phase by the group as a whole, split evenly across the files as well.
+    phases: Dict[str, float] = {}
+    token = phase_times.set(phases)
+
+    durations: List[float] = [estimate_duration(source) for source in sources]
+
+    def on_progress(progress: ConversionProgress, _: Optional[float]) -> None:
+        for source, duration in zip(sources, durations):
+            report_progress(source, min(progress.out_time, duration), duration or None)
+
+    try:
+        finished, media_infos, last_message = run_ffmpeg(arguments + ['-y'], outputs=partials,
+                                                         on_progress=on_progress, overwrite=True)
+    except Exception as error:
+        finished, media_infos, last_message = False, [], repr(error)
+
+    if not finished or len(media_infos) != len(sources) or not all(map(isfile, partials)):
+        phase_times.reset(token)
+        print(f'\n\tFailed to convert a group of {len(sources)} files ({last_message}), '
+              f'converting them one at a time')
+
+        remove_outputs(partials)
+        return [convert_file(source, overwrite=overwrite, show_progress=False) for source in sources]
+
+    # Indices of the flac files that could not be moved into place.
+    unsaved: Set[int] = set()
+    for i in range(len(sources)):
+        try:
+            finalize_outputs([flac_files[i]])
+        except OSError as error:
+            print(f'\n\tFailed to save "{flac_files[i]}" ({error}), converting "{sources[i]}" on '
+                  f'its own')
+            remove_outputs([partials[i]])
+            unsaved.add(i)
+
+    phase_times.reset(token)
+
+    seconds: float = (time() - start_time) / len(sources)
+    results: List[ConversionResult] = []
+
+    for i in range(len(sources)):
+        if media_infos[i].streams and get_cached_info(sources[i]) is None:
+            cache_info(sources[i], media_infos[i])
+
+        if i in unsaved:
+            results.append(convert_file(sources[i], overwrite=overwrite, show_progress=False))
+            continue
+
+        results.append(ConversionResult(sources[i], True, [flac_files[i]],
+                                        media_infos[i].duration or 0.0, seconds, False,
+                                        {phase: time_spent / len(sources)
+                                         for phase, time_spent in phases.items()}))
+
+    return results
+
+
+def convert_job(job: List[str], *, overwrite: bool = False,
+                show_progress: bool = True) -> List[ConversionResult]:
+    """
+        Converts the files of a job - either a single file, or a group of short files (see
+        `group_sources`).
+    """
+
+    # Holding a worker while the job runs, the segmented mode borrows the idle ones only.
+    workers: Optional[Semaphore] = idle_workers
+    if workers is not None:
+        workers.acquire()
+
+    board: Optional[ProgressBoard] = dashboard
+    if board is not None:
+        for source in job:
+            board.start(source)
+
+    try:
+        if len(job) == 1:
+            results: List[ConversionResult] = [convert_file(job[0], overwrite=overwrite,
+                                                            show_progress=show_progress)]
+        else:
+            results = convert_group(job, overwrite=overwrite)
+    finally:
+        if workers is not None:
+            workers.release()
+
+    if board is not None:
+        for result in results:
+            board.finish(result.source, result.duration)
+
+    # Releasing the leases right away, the results might only be collected much later.
+    for result in results:
+        release_source(result.source, result.state)
+
+    return results
+
+
+def convert_files(sources: Iterable[str], *, overwrite: bool = False,
+                  worker_count: int = 1) -> List[ConversionResult]:
+    """
+        Converts all the files in the iterable, running up to `worker_count` conversions at the
+        same time.
+
+        Remarks
+        --------
+        Each conversion is handled by an ffmpeg child process, the threads in the pool do nothing
+        more than waiting on these processes - a thread pool is enough to keep all the cores busy.
+
+        The sources are consumed lazily, a conversion starts as soon as its source is produced by
+        the iterable - if the iterable is a generator scanning a directory, the conversions begin
+        while the scan is still running. At most twice as many jobs as the number of workers are
+        queued at any moment, the iterable is not consumed any faster than the files are converted.
+
+        Short files are grouped, and each group is converted by a single ffmpeg process (see
+        `group_threshold`). The results are still reported for each file.
+
+        The state of each file is recorded in the journal (see `record_job`) once it is handed
+        over to be converted, and again once it is done.
+
+        With a single worker, the files are processed one after the other along with the progress
+        bar (unless running in batch mode). With more than one worker, the progress of all the
+        conversions is shown by a `ProgressBoard` instead, and a line is printed every time a file
+        is done. If the sources are already known (a list, as returned by `schedule_sources`), all
+        of them count towards the time remaining right away - otherwise, the files are counted
+        once they are pulled from the iterable.
+
+        If `min_jobs` is set (and is below `worker_count`), the number of conversions running at
+        the same time is adapted to the load of the system by a `ConcurrencyController`, between
+        `min_jobs` and `worker_count` - the jobs are then handed over to the pool only as workers
+        become available, rather than being queued ahead.
+
+        Parameters
+        -----------
+        sources: Iterable of strings, each containing the full path of a file to be converted \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+        worker_count: Number of files to be converted at the same time. Default --> 1 \n
+
+        Returns
+        --------
+        A list containing the result of `convert_file` for each file, in the same order as the
+        files were produced by `sources` - irrespective of the order the conversions finished in.
+    """
+
+    # Results of the conversions mapped to the index of the source, used to keep them in order.
+    finished: Dict[int, ConversionResult] = {}
+
+    if worker_count <= 1:
+        for job in group_sources(sources, overwrite=overwrite):
+            if len(job) > 1:
+                print(f'\n({job[0][0] + 1}) Processing {len(job)} files: '
+                      f'{", ".join(path.basename(source) for _, source in job)}')
+            else:
+                print(f'\n({job[0][0] + 1}) Processing file: {path.basename(job[0][1])}')
+
+            for _, source in job:
+                record_job(source, 'running')
+
+            results: List[ConversionResult] = convert_job([source for _, source in job],
+                                                          overwrite=overwrite,
+                                                          show_progress=not batch_mode)
+            for (index, _), result in zip(job, results):
+                finished[index] = result
+                record_job(result.source, result.state)
+
+            if len(job) == 1 and results[0].success and not batch_mode:
+                # Once the flac file is created successfully, replacing the progress bar with a
+                # filled one, and time remaining as zero - without this, the progress bar will
+                # remain stuck near the end and another will be drawn for the next file - this might
+                # confuse some users into thinking that the process failed.
+                animated_progress(100, 100, 0)
+
+            # Finally printing the success message.
+            for result in results:
+                for flac_file in result.flac_files:
+                    print(f'\n\tGenerated file "{flac_file}" successfully')
+
+        return [finished[index] for index in sorted(finished)]
+
+    print(f'\nConverting files using {worker_count} workers')
+
+    global idle_workers
+    idle_workers = Semaphore(worker_count)
+
+    # Futures of the jobs that are queued (or running), mapped to the indices of their sources.
+    queued: Dict[Future, List[int]] = {}
+
+    def collect(futures: Set[Future]) -> None:
+        # Moves the results of the futures that are done into `finished`.
+        for future in futures:
+            # Number of files converted, or being converted, so far.
+            total: int = len(finished) + sum(map(len, queued.values()))
+
+            for index, result in zip(queued.pop(future), future.result()):
+                finished[index] = result
+                record_job(result.source, result.state)
+
+                status: str = 'Finished' if result.success else \
+                    'Skipped' if result.skipped else 'Failed'
+                print(f'({len(finished)}/{total}) {status} file: {path.basename(result.source)}')
+
+    with ProgressBoard() as board, ThreadPoolExecutor(max_workers=worker_count) as pool:
+        controller: Optional[ConcurrencyController] = None
+        if 0 < min_jobs < worker_count:
+            controller = ConcurrencyController(board, min_jobs, worker_count)
+            print(f'Adapting the number of workers between {min_jobs} and {worker_count}')
+
+        if isinstance(sources, list):
+            for source in sources:
+                board.queue(source)
+
+        for job in group_sources(sources, overwrite=overwrite):
+            while len(queued) >= (controller.workers if controller else worker_count * 2):
+                # Waiting for a worker to be free before pulling more sources from the iterable -
+                # checking the load of the system every now and then, while adapting the workers.
+                collect(wait(queued, timeout=adaptive_interval if controller else None,
+                             return_when=FIRST_COMPLETED).done)
+
+                if controller:
+                    controller.update(len(queued))
+
+            for _, source in job:
+                board.queue(source)
+                record_job(source, 'running')
+
+            queued[pool.submit(convert_job, [source for _, source in job], overwrite=overwrite,
+                               show_progress=False)] = [index for index, _ in job]
+
+        collect(wait(queued).done)
+
+    idle_workers = None
+    return [finished[index] for index in sorted(finished)]
+
+
+def print_summary(results: List[ConversionResult], time_elapsed: float, *,
+                  skipped: int = 0) -> None:
+    """
+        Prints the result for each file (in the order the files were found), followed by the
+        throughput of the whole batch.
+
+        Parameters
+        -----------
+        results: List of results as returned by `convert_files` \n
+        time_elapsed: Amount of (wall-clock) seconds spent converting the entire batch \n
+        skipped: Number of files skipped as their output was already up to date. Default --> 0 \n
+    """
+
+    print('\n\nSummary:')
+    for result in results:
+        if result.success:
+            print(f'\t[ OK ]    {", ".join(result.flac_files)}    ({round(result.seconds, 2)}s)')
+        elif result.quarantined:
+            print(f'\t[STUCK]   {result.source}')
+        elif result.skipped:
+            print(f'\t[SKIP]    {result.source}')
+        else:
+            print(f'\t[FAIL]    {result.source}')
+
+    converted: int = sum(1 for result in results if result.success)
+    existing: int = sum(1 for result in results if result.skipped)
+    audio_seconds: float = sum(result.duration for result in results if result.success)
+
+    # Avoiding a division by zero for empty (or impossibly fast) batches.
+    time_elapsed = max(time_elapsed, 1e-6)
+
+    print(f'\nConverted {converted}/{len(results) - existing} files in '
+          f'{print_time(int(time_elapsed))}')
+    if skipped:
+        print(f'Skipped {skipped} files that were already up to date')
+    if existing:
+        print(f'Skipped {existing} files whose flac file exists already (not overwriting)')
+
+    quarantined: List[str] = [result.source for result in results if result.quarantined]
+    if quarantined:
+        print(f'Quarantined {len(quarantined)} files that got ffmpeg stuck on every attempt:')
+        for source in quarantined:
+            print(f'\t{source}')
+    print(f'Throughput: {round(len(results) / time_elapsed, 2)} files/sec, '
+          f'{round(audio_seconds / time_elapsed, 2)} audio-seconds/sec')
+
+
+def watch_directory(root_dir: str, *, overwrite: bool = False, worker_count: int = 1) -> int:
+    """
+        Converts the files present inside the root directory, and then each new file as it lands in
+        the directory - until the user hits Ctrl-C.
+
+        Remarks
+        --------
+        The files are found by a `DirectoryWatcher`. The files that are ready at the same time are
+        converted together, using `convert_files` (or `convert_files_async` with the `async`
+        engine), and a summary is printed once they are done. The files landing in the meantime are
+        picked up as soon as these are done.
+
+        Parameters
+        -----------
+        root_dir: Full path of the directory to be watched \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+        worker_count: Number of files to be converted at the same time. Default --> 1 \n
+
+        Returns
+        --------
+        The exit status of the script - `exit_status_failed` if any file failed to convert, zero
+        otherwise.
+    """
+
+    watcher: DirectoryWatcher = DirectoryWatcher(root_dir, use_inotify=watch_mode != 'poll',
+                                                 overwrite=overwrite)
+    failed: int = 0
+
+    try:
+        while True:
+            print(f'\nWatching "{root_dir}" for new files '
+                  f'({"inotify" if watcher.inotify is not None else "polling"}), '
+                  f'hit Ctrl-C to stop')
+
+            sources: List[str] = watcher.wait()
+            batch_start: float = time()
+
+            if engine == 'async':
+                results: List[ConversionResult] = asyncio.run(
+                    convert_files_async(sources, overwrite=overwrite, worker_count=worker_count)
+                )
+            else:
+                results = convert_files(sources, overwrite=overwrite, worker_count=worker_count)
+
+            print_summary(results, time() - batch_start)
+            failed += sum(1 for result in results if result.failed)
+    except KeyboardInterrupt:
+        print(f'\n\nStopped watching "{root_dir}"')
+    finally:
+        watcher.close()
+
+    return exit_status_failed if failed else 0
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    """
+        Returns the median, 90th and 99th percentile (nearest-rank), and the highest of the values.
+    """
+
+    if not values:
+        return {}
+
+    ordered: List[float] = sorted(values)
+
+    def rank(fraction: float) -> float:
+        return ordered[max(ceil(fraction * len(ordered)) - 1, 0)]
+
+    return {'p50': rank(0.5), 'p90': rank(0.9), 'p99': rank(0.99), 'max': ordered[-1]}
+
+
+def file_record(result: ConversionResult) -> Dict[str, Union[str, bool, float, int, None]]:
+    """
+        Builds the record written to the report for a single file.
+
+        Remarks
+        --------
+        The compression ratio is the size of the flac file(s) divided by the size of the source,
+        the speed is the amount of audio converted per (wall-clock) second - `None` if unknown.
+    """
+
+    def size(file_path: str) -> int:
+        return stat(file_path).st_size if isfile(file_path) else 0
+
+    input_bytes: int = size(result.source)
+    output_bytes: int = sum(map(size, result.flac_files))
+
+    record: Dict[str, Union[str, bool, float, int, None]] = {
+        'source': result.source,
+        'success': result.success,
+        'skipped': result.skipped,
+        'input_bytes': input_bytes,
+        'output_bytes': output_bytes,
+        'compression_ratio': round(output_bytes / input_bytes, 4) if input_bytes and
+        output_bytes else None,
+        'duration': round(result.duration, 3),
+        'seconds': round(result.seconds, 4),
+        'speed': round(result.duration / result.seconds, 2) if result.seconds and
+        result.duration else None,
+    }
+
+    for phase in ['probe', 'spawn', 'encode', 'write']:
+        record[f'{phase}_seconds'] = round((result.phases or {}).get(phase, 0.0), 4)
+
+    return record
+
+
+def summarize_run(records: List[Dict], scan_seconds: float) -> Dict:
+    """
+        Aggregates the records of the files into a summary of the whole run - the total time spent
+        in each phase, along with the percentiles of the time taken by a file, of the encoder speed,
+        and of the compression ratio.
+    """
+
+    def values(key: str) -> List[float]:
+        return [record[key] for record in records if record.get(key) is not None]
+
+    phases: Dict[str, float] = {'scan': round(scan_seconds, 4)}
+    for phase in ['probe', 'spawn', 'encode', 'write']:
+        phases[phase] = round(sum(values(f'{phase}_seconds')), 4)
+
+    return {
+        'files': len(records),
+        'failed': sum(1 for record in records if not record['success'] and not record['skipped']),
+        'skipped': sum(1 for record in records if record['skipped']),
+        'phases': phases,
+        'seconds': percentiles(values('seconds')),
+        'speed': percentiles(values('speed')),
+        'compression_ratio': percentiles(values('compression_ratio')),
+    }
+
+
+def print_run_summary(summary: Dict) -> None:
+    """
+        Prints the time spent in each phase, and the percentiles, from the summary of a run (as
+        returned by `summarize_run`).
+    """
+
+    total: float = max(sum(summary['phases'].values()), 1e-6)
+
+    print('\nTime spent per phase (summed across files):')
+    for phase, seconds in summary['phases'].items():
+        print(f'\t{phase:<8}{round(seconds, 2):>10}s    {round(seconds / total * 100, 1):>5}%')
+
+    labels: Dict[str, str] = {'seconds': 'Seconds per file', 'speed': 'Encoder speed (x)',
+                              'compression_ratio': 'Compression ratio'}
+    for key, label in labels.items():
+        if summary[key]:
+            print(f'{label}: ' + ', '.join(f'{name} {round(value, 3)}'
+                                            for name, value in summary[key].items()))
+
+
+def write_report(report_path: str, records: List[Dict], summary: Dict) -> None:
+    """
+        Writes the record of each file to the report, see `report_file`.
+
+        Remarks
+        --------
+        A CSV report contains one row per file. A JSON Lines report contains one line per file,
+        followed by a final line holding the summary of the run (under the `summary` key).
+    """
+
+    try:
+        with open(report_path, 'w', encoding='utf-8', newline='') as file:
+            if report_path.lower().endswith('.csv'):
+                writer = DictWriter(file, fieldnames=list(records[0]) if records else ['source'])
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                for record in records:
+                    file.write(dumps(record) + '\n')
+                file.write(dumps({'summary': summary}) + '\n')
+    except OSError as error:
+        print(f'\nFailed to write the report "{report_path}": {error}')
+        return
+
+    print(f'\nSaved the report to "{report_path}"')
+
+
+def hash_file(file_path: str) -> str:
+    """
+        Calculates the SHA-256 hash of the contents of a file. The file is read in chunks, large
+        files are never loaded into the memory as a whole.
+
+        Returns
+        --------
+        String containing the hash as a hexadecimal number.
+    """
+
+    digest = sha256()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(hash_chunk_size), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def encoder_settings() -> Dict[str, str]:
+    """
+        Returns the settings that the flac files are generated with. These are recorded in the
+        manifest, a change in any of these settings makes all the previously generated files stale.
+    """
+
+    return {
+        'process': process_name,
+        'codec': 'flac',
+        'audio_tracks': audio_tracks,
+        'segmented': segment_threshold > 0,
+        'native': sorted(native_files) if soundfile is not None else []
+    }
+
+
+def load_manifest(root_dir: str) -> Dict[str, Dict]:
+    """
+        Loads the manifest present in the root directory.
+
+        Remarks
+        --------
+        The manifest is a dictionary with the path of each source converted so far (relative to
+        the root directory) as its key, mapped to the size, modification time, hash (if known) of
+        the source, the path of the output(s) and the encoder settings used to generate them.
+
+        Returns
+        --------
+        The dictionary stored in the manifest, an empty dictionary if the manifest does not exist
+        or can't be read.
+    """
+
+    try:
+        with open(join(root_dir, manifest_name), 'r', encoding='utf-8') as file:
+            manifest = load(file)
+    except (OSError, ValueError):
+        return {}
+
+    return manifest if isinstance(manifest, dict) else {}
+
+
+@contextmanager
+def manifest_lock(root_dir: str) -> Iterator[None]:
+    """
+        Context manager locking the manifest of the root directory, for the processes sharing a
+        queue (see `shared_queue`) to update the manifest one at a time.
+
+        Remarks
+        --------
+        The lock is a file next to the manifest, created with `O_EXCL` - the same way as a lease
+        (see `claim_source`). A lock older than `lease_timeout` seconds was left behind by a
+        process that died, it is taken over - renamed first, only one process manages to do so.
+    """
+
+    lock: str = join(root_dir, manifest_name + '.lock')
+
+    while True:
+        try:
+            os_close(os_open(lock, O_CREAT | O_EXCL | O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                info = stat(lock)
+                if share_time() - info.st_mtime < lease_timeout:
+                    sleep(0.1)
+                    continue
+
+                stale: str = f'{lock}.{worker_name}.stale'
+                rename(lock, stale)
+            except FileNotFoundError:
+                # Released in the meantime.
+                continue
+
+            if stat(stale).st_ino != info.st_ino:
+                # Taken again after it was checked, putting it back.
+                try:
+                    link(stale, lock)
+                except OSError:
+                    pass
+            remove(stale)
+
+    try:
+        yield
+    finally:
+        remove(lock)
+
+
+def save_manifest(root_dir: str, manifest: Dict[str, Dict],
+                  sources: Optional[List[str]] = None) -> None:
+    """
+        Saves the manifest inside the root directory. The manifest is written to a temporary file
+        first, and then renamed - the previous manifest is never left half-written.
+
+        Remarks
+        --------
+        With a shared queue, the other processes update the manifest as well - the manifest is
+        loaded again while locked (see `manifest_lock`), and only the entries of the sources
+        converted by this process are replaced.
+
+        Parameters
+        -----------
+        root_dir: String containing the root directory the manifest belongs to \n
+        manifest: Dictionary as returned by `load_manifest` \n
+        sources: Full path of each source recorded by this run, see `update_manifest` \n
+    """
+
+    manifest_path: str = join(root_dir, manifest_name)
+    temporary: str = f'{manifest_path}.{worker_name}.tmp'
+
+    with manifest_lock(root_dir) if queue_directory else nullcontext():
+        if queue_directory:
+            merged: Dict[str, Dict] = load_manifest(root_dir)
+            for source in sources or []:
+                if relpath(source, root_dir) in manifest:
+                    merged[relpath(source, root_dir)] = manifest[relpath(source, root_dir)]
+            manifest = merged
+
+        with open(temporary, 'w', encoding='utf-8') as file:
+            dump(manifest, file, indent=1, sort_keys=True)
+
+        replace(temporary, manifest_path)
+
+
+def is_up_to_date(root_dir: str, source: str, manifest: Dict[str, Dict], *,
+                  use_hash: bool = False) -> bool:
+    """
+        Checks if the flac file generated from a source is up to date, i.e. the source and the
+        encoder settings are the same as they were when the flac file was generated.
+
+        Remarks
+        --------
+        A source is considered unchanged if its size and modification time match the ones recorded
+        in the manifest. If `use_hash` is true, a source whose modification time has changed (but
+        not the size) is hashed, and considered unchanged if the contents are the same - the
+        modification time in the manifest is then updated to avoid hashing the file again.
+
+        Parameters
+        -----------
+        root_dir: String containing the root directory the manifest belongs to \n
+        source: Full path of the source file \n
+        manifest: Dictionary as returned by `load_manifest` \n
+        use_hash: Boolean indicating if contents are to be compared when the modification time
+        does not match. Default --> false \n
+
+        Returns
+        --------
+        True if the flac file is up to date and the source can be skipped, false otherwise.
+    """
+
+    entry: Optional[Dict] = manifest.get(relpath(source, root_dir))
+    if not entry or entry.get('settings') != encoder_settings():
+        return False
+    elif not entry.get('outputs') or \
+            not all(isfile(join(root_dir, output)) for output in entry['outputs']):
+        # The flac file has been deleted (or moved) since it was generated.
+        return False
+
+    try:
+        info = stat(source)
+        if info.st_size != entry.get('size'):
+            return False
+        elif info.st_mtime_ns == entry.get('mtime'):
+            return True
+        elif not use_hash or not entry.get('hash'):
+            return False
+
+        if hash_file(source) != entry['hash']:
+            return False
+    except OSError:
+        # Removed (or unreadable) since it was found, left to the conversion to report.
+        return False
+
+    entry['mtime'] = info.st_mtime_ns
+    return True
+
+
+def update_manifest(root_dir: str, source: str, flac_files: List[str],
+                    manifest: Dict[str, Dict], *, use_hash: bool = False) -> None:
+    """
+        Records a source that has been converted successfully in the manifest. The manifest is
+        only updated in the memory, `save_manifest` is to be used to save it.
+
+        Flac files recorded for the source by an earlier run, and not generated this time (e.g. the
+        audio tracks extracted have changed), are removed. If the source can't be read anymore, the
+        reason is printed and the earlier entry (if any) is kept.
+
+        Parameters
+        -----------
+        root_dir: String containing the root directory the manifest belongs to \n
+        source: Full path of the source file \n
+        flac_files: List containing the full path of each flac file generated from the source \n
+        manifest: Dictionary as returned by `load_manifest` \n
+        use_hash: Boolean indicating if the hash of the source is to be recorded. Default --> false \n
+    """
+
+    try:
+        info = stat(source)
+        digest: Optional[str] = hash_file(source) if use_hash else None
+    except OSError as error:
+        print(f'\nUnable to record "{source}" in the manifest: {error}')
+        return
+
+    outputs: List[str] = [relpath(flac_file, root_dir) for flac_file in flac_files]
+    entry: Dict = manifest.get(relpath(source, root_dir)) or {}
+
+    for output in entry.get('outputs', []):
+        if output not in outputs and isfile(join(root_dir, output)):
+            remove(join(root_dir, output))
+
+    manifest[relpath(source, root_dir)] = {
+        'size': info.st_size,
+        'mtime': info.st_mtime_ns,
+        'hash': digest,
+        'outputs': outputs,
+        'settings': encoder_settings()
+    }
+
+
+def skip_up_to_date(root_dir: str, sources: Iterable[str], manifest: Dict[str, Dict], *,
+                    use_hash: bool = False, skipped: Optional[List[str]] = None) -> Iterator[str]:
+    """
+        Generator yielding the sources that are to be converted, skipping the ones whose flac file
+        is up to date (see `is_up_to_date`).
+
+        Remarks
+        --------
+        The flac file generated from a source that has changed since (or with other encoder
+        settings) is stale. It was created by this script, and is overwritten by the new one (see
+        `stale_sources`) - it is kept, along with its entry in the manifest, if the new conversion
+        fails.
+
+        Parameters
+        -----------
+        root_dir: String containing the root directory the manifest belongs to \n
+        sources: Iterable of strings, each containing the full path of a source \n
+        manifest: Dictionary as returned by `load_manifest` \n
+        use_hash: Boolean passed on to `is_up_to_date`. Default --> false \n
+        skipped: List to which the sources that are skipped are appended. Optional \n
+    """
+
+    for source in sources:
+        if is_up_to_date(root_dir, source, manifest, use_hash=use_hash):
+            if skipped is not None:
+                skipped.append(source)
+            continue
+
+        if relpath(source, root_dir) in manifest:
+            stale_sources.add(source)
+
+        yield source
+
+
+def dedup_sources(sources: Iterable[str], duplicates: Dict[str, List[str]]) -> List[str]:
+    """
+        Removes the sources whose contents are identical to those of an earlier source.
+
+        Remarks
+        --------
+        The sources are grouped by their size first, only the sources sharing their size with
+        another source are hashed (see `hash_file`) - most sources are never read. Hardlinks of the
+        same file are hashed once. The sources are consumed completely before any of them is
+        returned.
+
+        Parameters
+        -----------
+        sources: Iterable of strings, each containing the full path of a source \n
+        duplicates: Dictionary to which the first source of each group of identical sources is
+        added, mapped to the other sources of the group \n
+
+        Returns
+        --------
+        A list containing the sources left, in the same order.
+    """
+
+    sources = list(sources)
+    sizes: Dict[int, List[str]] = {}
+
+    for source in sources:
+        try:
+            size: int = stat(source).st_size
+        except OSError:
+            # Left to the conversion, which reports the error.
+            continue
+
+        if size:
+            sizes.setdefault(size, []).append(source)
+
+    removed: Set[str] = set()
+    for group in sizes.values():
+        if len(group) < 2:
+            continue
+
+        # First source found with each hash, and the hash of each file (by device and inode).
+        first: Dict[str, str] = {}
+        inodes: Dict[Tuple[int, int], str] = {}
+
+        for source in group:
+            try:
+                info = stat(source)
+                if (info.st_dev, info.st_ino) not in inodes:
+                    inodes[(info.st_dev, info.st_ino)] = hash_file(source)
+            except OSError as error:
+                print(f'\nFailed to hash "{source}": {error}')
+                continue
+
+            digest: str = inodes[(info.st_dev, info.st_ino)]
+            if first.setdefault(digest, source) != source:
+                duplicates.setdefault(first[digest], []).append(source)
+                removed.add(source)
+
+    return [source for source in sources if source not in removed]
+
+
+def clone_file(source: str, target: str, *, hardlink: bool = True) -> str:
+    """
+        Clones a flac file - a reflink if the file system supports it, a hardlink otherwise (if
+        allowed), and a copy as the last resort.
+
+        Remarks
+        --------
+        Like the flac files generated by ffmpeg, the clone is created at the partial path of the
+        target (see `partial_path`), and renamed into place once complete.
+
+        Exceptions
+        -----------
+        OSError: Thrown if the file could not be copied either.
+
+        Returns
+        --------
+        String describing the way the file was cloned - reflinked, hardlinked or copied.
+    """
+
+    partial: str = partial_path(target)
+    remove_outputs([partial])
+
+    method: str = 'copied'
+    try:
+        if ioctl is None:
+            raise OSError('Reflinks are not supported')
+
+        with open(source, 'rb') as original, open(partial, 'wb') as clone:
+            ioctl(clone.fileno(), clone_request, original.fileno())
+        method = 'reflinked'
+    except OSError:
+        remove_outputs([partial])
+
+        try:
+            if not hardlink:
+                raise OSError('Hardlinks are not allowed')
+
+            link(source, partial)
+            method = 'hardlinked'
+        except OSError:
+            copyfile(source, partial)
+
+    replace(partial, target)
+
+    # Renaming a hardlink over another link to the same file does nothing, the partial file stays.
+    remove_outputs([partial])
+    return method
+
+
+def materialize_duplicates(results: List[ConversionResult], duplicates: Dict[str, List[str]], *,
+                           overwrite: bool = False) -> List[ConversionResult]:
+    """
+        Creates the flac file(s) of each duplicate source by cloning the flac file(s) generated for
+        the source it is identical to (see `dedup_sources` and `clone_file`).
+
+        Remarks
+        --------
+        The flac files of a duplicate are named after the duplicate itself, and saved next to it. A
+        duplicate fails along with the source it is identical to. The flac files of a stale
+        duplicate (see `stale_sources`) are overwritten, the same way as the ones of a stale source.
+
+        Parameters
+        -----------
+        results: List of results as returned by `convert_files` \n
+        duplicates: Dictionary populated by `dedup_sources` \n
+        overwrite: Boolean indicating if a file should be overwritten or not. Default --> false \n
+
+        Returns
+        --------
+        A list containing a result for each duplicate, the time taken being the time spent cloning
+        its flac file(s).
+    """
+
+    clones: List[ConversionResult] = []
+
+    for result in results:
+        stem: str = path.basename(result.source).rpartition('.')[0]
+
+        for duplicate in duplicates.get(result.source, []):
+            if not result.success:
+                reason: str = 'was skipped' if result.skipped else 'failed to convert'
+                print(f'\n\tNot generating "{flac_path(duplicate)}", identical to '
+                      f'"{result.source}" which {reason}')
+                clones.append(ConversionResult(duplicate, False, [], result.duration, 0.0,
+                                               skipped=result.skipped))
+                continue
+
+            start_time: float = perf_counter()
+
+            # Flac files extracted from each audio track carry a suffix after the name of the source.
+            targets: List[str] = [
+                join(path.dirname(duplicate), path.basename(duplicate).rpartition('.')[0] +
+                     path.basename(flac_file)[len(stem):]) for flac_file in result.flac_files
+            ]
+
+            existing: List[str] = [target for target in targets if isfile(target)]
+            if existing and not (overwrite or duplicate in stale_sources):
+                print(f'\n\tNot overwriting "{existing[0]}"')
+                clones.append(ConversionResult(duplicate, False, [], result.duration, 0.0,
+                                               skipped=True))
+                continue
+
+            try:
+                for flac_file, target in zip(result.flac_files, targets):
+                    method: str = clone_file(flac_file, target, hardlink=dedup_mode is True)
+                    print(f'\n\tGenerated file "{target}" successfully ({method} from '
+                          f'"{flac_file}")')
+            except OSError as error:
+                print(f'\n\tFailed to clone the flac file of "{result.source}" for '
+                      f'"{duplicate}": {error}')
+                clones.append(ConversionResult(duplicate, False, [], result.duration, 0.0))
+                continue
+
+            seconds: float = perf_counter() - start_time
+            clones.append(ConversionResult(duplicate, True, targets, result.duration, seconds,
+                                           phases={'write': seconds}))
+
+    return clones
+
+
+def load_journal(root_dir: str) -> Tuple[Dict[str, str], bool]:
+    """
+        Reads the journal left behind by a batch that was interrupted.
+
+        Remarks
+        --------
+        The last state recorded for a file wins. A line cut short (the batch died while it was
+        being written) is ignored.
+
+        Returns
+        --------
+        A tuple containing a dictionary and a boolean. The dictionary maps the full path of each
+        file in the journal to its state, in the order the files were found. The boolean is true if
+        the directory was scanned completely before the batch was interrupted.
+    """
+
+    states: Dict[str, str] = {}
+    scanned: bool = False
+
+    try:
+        with open(join(root_dir, journal_name), 'r', encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry: Dict[str, str] = loads(line)
+                    if entry['state'] == 'scanned':
+                        scanned = True
+                    else:
+                        states[entry['source']] = entry['state']
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except OSError:
+        # No journal, or one that can't be read - either way, there is nothing to resume.
+        return {}, False
+
+    return states, scanned
+
+
+def open_journal(root_dir: str, done: Iterable[str] = ()) -> None:
+    """
+        Starts the journal for the batch about to be converted, replacing the journal of an earlier
+        batch (if any).
+
+        Parameters
+        -----------
+        root_dir: String containing the root directory the journal belongs to \n
+        done: Full path of each file converted by the batch being resumed. Carried over to the new
+        journal, so that the files are skipped if this batch is interrupted as well. Optional \n
+    """
+
+    global journal_file
+
+    try:
+        journal_file = open(join(root_dir, journal_name), 'w', encoding='utf-8')
+    except OSError as error:
+        print(f'\nUnable to create the journal, the batch can\'t be resumed if interrupted: {error}')
+        journal_file = None
+        return
+
+    for source in done:
+        record_job(source, 'done')
+
+
+def record_job(source: str, state: str) -> None:
+    """
+        Appends the state of a file (pending, running, done or failed) to the journal.
+
+        Remarks
+        --------
+        Each line is flushed as soon as it is written - the journal is of no use if the lines are
+        still buffered when the script dies. The lines are written under a lock: with the `async`
+        engine, the files are recorded as pending (see `journal_sources`) by the thread pulling
+        them, while the event loop records the files that are running and done.
+    """
+
+    # The line marking the end of the scan does not belong to any file.
+    entry: Dict[str, str] = {'source': source, 'state': state} if source else {'state': state}
+
+    with journal_lock:
+        if journal_file is None:
+            return
+
+        journal_file.write(dumps(entry) + '\n')
+        journal_file.flush()
+
+
+def close_journal(root_dir: str) -> None:
+    """
+        Closes and removes the journal once the batch is over, there is nothing left to resume.
+    """
+
+    global journal_file
+
+    with journal_lock:
+        if journal_file is None:
+            return
+
+        journal_file.close()
+        journal_file = None
+
+    remove(join(root_dir, journal_name))
+
+
+def lease_path(source: str) -> str:
+    """
+        Returns the path of the lease on a file inside the shared queue, the state of the file is
+        saved next to it (same path, with `.state` in place of `.lease`).
+
+        Remarks
+        --------
+        The name is derived from the path of the file relative to the root directory - the share
+        can be mounted at a different path on each machine.
+    """
+
+    relative: str = relpath(source, queue_root).replace('\\', '/')
+    return join(queue_directory, sha256(relative.encode('utf-8')).hexdigest() + '.lease')
+
+
+def share_time() -> float:
+    """
+        Returns the current time as seen by the file system holding the shared queue.
+
+        Remarks
+        --------
+        The age of a lease is measured against the clock of the file system (which sets the
+        modification time of the lease), the clocks of the machines sharing it can be off by a lot
+        more than the timeout of a lease. The clock file of this process is touched, and its
+        modification time read back.
+    """
+
+    clock: str = join(queue_directory, f'.{worker_name}.clock')
+    open(clock, 'a').close()
+    utime(clock)
+
+    return stat(clock).st_mtime
+
+
+def open_queue(root_dir: str, name: str) -> None:
+    """
+        Joins the shared queue of the given name inside the root directory, creating it if needed,
+        and starts renewing the leases held by this process.
+
+        Exceptions
+        -----------
+        OSError: Thrown if the directory of the queue can't be created.
+    """
+
+    global queue_root, queue_directory
+
+    queue_root, queue_directory = root_dir, join(root_dir, queue_dir_name, name)
+    makedirs(queue_directory, exist_ok=True)
+
+    Thread(target=renew_leases, daemon=True).start()
+
+
+def close_queue() -> None:
+    """
+        Releases the leases still held by this process (the conversions were interrupted), the
+        files can be claimed by the other processes straight away - and leaves the shared queue.
+    """
+
+    global queue_directory
+
+    if not queue_directory:
+        return
+
+    with lease_lock:
+        for source, inode in held_leases.items():
+            try:
+                if stat(lease_path(source)).st_ino == inode:
+                    remove(lease_path(source))
+            except OSError:
+                pass
+
+        held_leases.clear()
+
+    try:
+        remove(join(queue_directory, f'.{worker_name}.clock'))
+    except OSError:
+        pass
+
+    queue_directory = ''
+
+
+def renew_leases() -> None:
+    """
+        Renews the leases held by this process every quarter of `lease_timeout`, for as long as the
+        process is part of a shared queue. Runs on a thread of its own.
+    """
+
+    while queue_directory:
+        sleep(lease_timeout / 4)
+
+        with lease_lock:
+            for source, inode in list(held_leases.items()):
+                lease: str = lease_path(source)
+                try:
+                    if stat(lease).st_ino != inode:
+                        raise FileNotFoundError
+                    utime(lease)
+                except OSError:
+                    # The process was stuck for longer than the timeout, another process took over.
+                    print(f'\n\tLost the lease on "{source}", it might be converted twice')
+                    del held_leases[source]
+
+
+def claim_source(source: str) -> str:
+    """
+        Claims a file in the shared queue, the file is then converted by this process alone.
+
+        Remarks
+        --------
+        A file is claimed by creating its lease, an operation that fails if the lease exists
+        already (`O_EXCL`, atomic on local file systems as well as NFS and SMB shares) - no two
+        processes hold the lease on a file at the same time. The lease is released once the file is
+        done, after saving the state of the file (see `release_source`).
+
+        A lease that has not been renewed for `lease_timeout` seconds is taken over - it is renamed
+        first, only one of the processes trying to take over the lease manages to do so. If the
+        lease was renewed in the meantime, it is put back in place.
+
+        Returns
+        --------
+        A string - `claimed` if the file has been claimed by this process, `held` if the file is
+        being converted by another process, and `done` if the file has been converted already
+        (whether the conversion succeeded or not).
+    """
+
+    lease: str = lease_path(source)
+    done: str = lease[:-len('.lease')] + '.state'
+
+    # Two attempts - an expired lease is taken over before claiming the file again.
+    for _ in range(2):
+        if isfile(done):
+            return 'done'
+
+        try:
+            descriptor: int = os_open(lease, O_CREAT | O_EXCL | O_WRONLY)
+        except FileExistsError:
+            try:
+                info = stat(lease)
+            except FileNotFoundError:
+                # Released in the meantime.
+                continue
+
+            if share_time() - info.st_mtime < lease_timeout:
+                return 'held'
+
+            # Taking over the expired lease - moving it out of the way first.
+            stale: str = f'{lease}.{worker_name}.stale'
+            try:
+                rename(lease, stale)
+            except FileNotFoundError:
+                continue
+
+            moved = stat(stale)
+            if moved.st_ino != info.st_ino or moved.st_mtime != info.st_mtime:
+                # The lease changed hands (or was renewed) after it was checked, putting it back.
+                try:
+                    link(stale, lease)
+                except OSError:
+                    pass
+                remove(stale)
+                return 'held'
+
+            remove(stale)
+            print(f'\nTaking over the expired lease on "{source}"')
+            continue
+
+        with fdopen(descriptor, 'w', encoding='utf-8') as file:
+            file.write(dumps({'source': source, 'owner': worker_name}))
+
+        if isfile(done):
+            # Converted by the process whose lease expired, before it could release the lease.
+            remove(lease)
+            return 'done'
+
+        with lease_lock:
+            held_leases[source] = stat(lease).st_ino
+
+        return 'claimed'
+
+    return 'held'
+
+
+def release_source(source: str, state: str) -> None:
+    """
+        Saves the state (done or failed) of a file claimed by this process, and then releases the
+        lease on the file. Nothing is done for a file that has not been claimed.
+
+        Called by the worker converting the file as soon as it is done - the process holding a
+        lease might be waiting on the other processes (see `shared_sources`) before it collects
+        the results of its own conversions.
+
+        Remarks
+        --------
+        The state is written to a temporary file, renamed into place - any process that finds the
+        state file finds it complete. A failed file is not claimed again by any process, the same
+        way it would not have been converted again by a single process.
+    """
+
+    with lease_lock:
+        inode: Optional[int] = held_leases.pop(source, None)
+
+    if inode is None or not queue_directory:
+        return
+
+    lease: str = lease_path(source)
+    done: str = lease[:-len('.lease')] + '.state'
+
+    try:
+        with open(f'{done}.{worker_name}.partial', 'w', encoding='utf-8') as file:
+            file.write(dumps({'source': source, 'state': state, 'owner': worker_name}))
+        replace(f'{done}.{worker_name}.partial', done)
+
+        if stat(lease).st_ino == inode:
+            remove(lease)
+    except OSError as error:
+        print(f'\n\tFailed to release the lease on "{source}": {error}')
+
+
+def shared_sources(sources: Iterable[str], others: Optional[List[str]] = None) -> Iterator[str]:
+    """
+        Generator passing on the sources claimed by this process in the shared queue (see
+        `claim_source`), skipping the ones converted (or being converted) by other processes.
+
+        Remarks
+        --------
+        The files being converted by other processes are checked again once the sources are
+        exhausted, every quarter of `lease_timeout` - until each of them is either done, or claimed
+        by this process after the process holding it died. Every process in the queue runs till
+        the last file is done.
+
+        Parameters
+        -----------
+        sources: Iterable of strings, each containing the full path of a source \n
+        others: List to which the sources converted by other processes are appended. Optional \n
+    """
+
+    waiting: List[str] = list()
+
+    for source in sources:
+        state: str = claim_source(source)
+        if state == 'claimed':
+            yield source
+        elif state == 'held':
+            waiting.append(source)
+        elif others is not None:
+            others.append(source)
+
+    while waiting:
+        print(f'\nWaiting for {len(waiting)} files being converted by other processes')
+        sleep(lease_timeout / 4)
+
+        remaining: List[str] = list()
+        for source in waiting:
+            state = claim_source(source)
+            if state == 'claimed':
+                yield source
+            elif state == 'held':
+                remaining.append(source)
+            elif others is not None:
+                others.append(source)
+
+        waiting = remaining
+
+
+def timed_sources(sources: Iterable[str], times: Dict[str, float]) -> Iterator[str]:
+    """
+        Generator passing on the sources as they are, adding the time spent producing them (i.e.
+        scanning the directory) to the `scan` key of the dictionary.
+
+        Remarks
+        --------
+        The scan runs alongside the conversions, only the time spent inside the scan is counted -
+        not the time spent converting the files in between.
+    """
+
+    iterator: Iterator[str] = iter(sources)
+    while True:
+        start_time: float = perf_counter()
+        source: Optional[str] = next(iterator, None)
+        times['scan'] = times.get('scan', 0.0) + perf_counter() - start_time
+
+        if source is None:
+            return
+
+        yield source
+
+
+def journal_sources(sources: Iterable[str]) -> Iterator[str]:
+    """
+        Generator recording each source in the journal as pending, before passing it on. Once the
+        sources are exhausted, the journal is marked as complete - a batch that is interrupted after
+        this point can be resumed without scanning the directory again.
+    """
+
+    for source in sources:
+        record_job(source, 'pending')
+        yield source
+
+    record_job('', 'scanned')
+
+
+def estimate_duration(source: str) -> float:
+    """
+        Estimates the duration (in seconds) of a file without firing ffmpeg.
+
+        Remarks
+        --------
+        The duration saved in the metadata cache is used if the file is present in the cache.
+        Otherwise, the duration of a wav file is calculated from the size of its data and the byte
+        rate, both read from the header of the file. The duration of any other file is guessed from
+        its size, using `estimated_byte_rates` - good enough to order the files by their duration,
+        not much more.
+
+        Returns
+        --------
+        Float containing the estimated duration, zero if the file can't be read.
+    """
+
+    media_info: Optional[MediaInfo] = get_cached_info(source)
+    if media_info is not None and media_info.duration:
+        return media_info.duration
+
+    try:
+        size: int = stat(source).st_size
+        if source.rpartition('.')[-1] != 'wav':
+            return size / estimated_byte_rates.get(source.rpartition('.')[-1], 32000)
+
+        with open(source, 'rb') as file:
+            if file.read(12)[8:] != b'WAVE':
+                return size / estimated_byte_rates.get('wav', 176400)
+
+            byte_rate: int = 0
+            while True:
+                header: bytes = file.read(8)
+                if len(header) < 8:
+                    break
+
+                chunk, length = header[:4], int.from_bytes(header[4:], 'little')
+                if chunk == b'fmt ':
+                    byte_rate = int.from_bytes(file.read(16)[8:12], 'little')
+                    length -= 16
+                elif chunk == b'data' and byte_rate:
+                    # Files written as a stream can have a blank size for their data chunk.
+                    remaining: int = size - file.tell()
+                    return (min(length, remaining) if length else remaining) / byte_rate
+
+                # Chunks are padded to an even number of bytes.
+                file.seek(length + (length & 1), 1)
+    except OSError:
+        return 0.0
+
+    return size / estimated_byte_rates.get('wav', 176400)
+
+
+# Scheduling policies available, see `schedule_policy`.
+scheduling_policies: Dict[str, Optional[Callable[[float], float]]] = {
+    'longest': lambda duration: -duration,
+    'shortest': lambda duration: duration,
+    'fifo': None
+}
+
+
+def predict_runtime(durations: List[float], worker_count: int) -> float:
+    """
+        Predicts the runtime (in seconds) of a batch, if the files are converted in the given order.
+
+        Remarks
+        --------
+        Simulates the worker pool - each file is handed to the first worker that is free, the same
+        way the files are picked up by the pool in `convert_files`. The time taken by each file is
+        estimated from its duration using `estimated_speed` and `estimated_overhead`.
+
+        Parameters
+        -----------
+        durations: List containing the (estimated) duration of each file, in the order the files
+        are to be converted \n
+        worker_count: Number of files converted at the same time \n
+    """
+
+    # Moments at which each worker will be free, kept as a heap.
+    workers: List[float] = [0.0] * max(worker_count, 1)
+
+    for duration in durations:
+        free: float = heappop(workers)
+        heappush(workers, free + duration / estimated_speed + estimated_overhead)
+
+    return max(workers)
+
+
+def schedule_sources(sources: Iterable[str], policy: str,
+                     worker_count: int) -> Tuple[Iterable[str], Optional[float]]:
+    """
+        Orders the sources as per the scheduling policy.
+
+        Parameters
+        -----------
+        sources: Iterable of strings, each containing the full path of a source \n
+        policy: Name of the policy, a key in `scheduling_policies` \n
+        worker_count: Number of files converted at the same time \n
+
+        Exceptions
+        -----------
+        KeyError: Thrown if there is no policy by the name.
+
+        Returns
+        --------
+        A tuple containing the sources, in the order they are to be converted, and the predicted
+        runtime of the batch (see `predict_runtime`). If the policy keeps the files in the order
+        they are found, the sources are returned as-is - without being consumed - and the runtime
+        can't be predicted (`None`).
+    """
+
+    key: Optional[Callable[[float], float]] = scheduling_policies[policy]
+    if key is None:
+        return sources, None
+
+    durations: Dict[str, float] = {source: estimate_duration(source) for source in sources}
+    ordered: List[str] = sorted(durations, key=lambda source: key(durations[source]))
+
+    return ordered, predict_runtime([durations[source] for source in ordered], worker_count)
+
+
+if __name__ == '__main__':
+    # A (fancy) welcome message, because why not
+    #
+    # ╮(╯▽╰)╭
+    welcome_message: str = \
+        """
+             ____  __     __    ___       ___  ____  __ _  ____  ____   __  ____  __  ____
+            (  __)(  )   / _\  / __)     / __)(  __)(  ( \(  __)(  _ \ / _\(_  _)/  \(  _ \\
+             ) _) / (_/\/    \( (__     ( (_ \ ) _) /    / ) _)  )   //    \ )( (  O ))   /
+            (__)  \____/\_/\_/ \___)     \___/(____)\_)__)(____)(__\_)\_/\_/(__) \__/(__\_)
+        """
+
+    # If length of `symbol` string is more than 4 characters, trimming it down to 4 characters.
+    symbol = symbol[:4] if len(symbol) > 4 else symbol
+
+    # Ensuring that the number of progress bars is an integer as it will be multiplied to a string.
+    progress_bar_count = int(progress_bar_count)
+
+    # Emptying the list as an edge-case precaution.
+    files = []
+
+    # Flag indicating if the interactive mode is to be used or not. True by default - disabled if
+    # user has passed command-line arguments, or if the script runs in batch mode.
+    interactive_mode: bool = True
+
+    # Nobody is there to answer the prompts if the input is not a terminal.
+    batch_mode = not stdin.isatty()
+
+    root = getcwd()
+    force_write = False
+
+    # Resume mode picks up the batch interrupted by the last run, skipping the files it converted.
+    resume: bool = False
+
+    # Incremental mode skips sources that have not changed since they were last converted. Can be
+    # false (disabled), true (compare size and modification time), or 'hash' (compare contents too).
+    incremental: Union[bool, str] = False
+
+    pattern_root = r'^--root="?(.*)"?$'
+    pattern_force_write = r'^--force(="?yes"?|="?no"?)?$'
+    pattern_jobs = r'^--jobs=([0-9]+)$'
+    pattern_jobs_range = r'^--jobs=([0-9]+)-([0-9]+)$'
+    pattern_batch = r'^--batch(="?yes"?|="?no"?)?$'
+    pattern_report = r'^--report="?(.*?)"?$'
+    pattern_resume = r'^--resume(="?yes"?|="?no"?)?$'
+    pattern_incremental = r'^--incremental(="?yes"?|="?no"?|="?hash"?)?$'
+    pattern_audio_tracks = r'^--audio-track="?(default|all|[0-9]+|[a-zA-Z]{2,3})"?$'
+    pattern_segment = r'^--segment=([0-9]+(?:\.[0-9]+)?)$'
+    pattern_schedule = r'^--schedule="?([a-z_]+)"?$'
+    pattern_cache = r'^--cache="?(.*?)"?$'
+    pattern_native = r'^--native(="?yes"?|="?no"?)?$'
+    pattern_group = r'^--group=([0-9]+(?:\.[0-9]+)?)$'
+    pattern_engine = r'^--engine="?([a-z]+)"?$'
+    pattern_timeout = r'^--timeout=([0-9]+(?:\.[0-9]+)?)$'
+    pattern_stall_timeout = r'^--stall-timeout=([0-9]+(?:\.[0-9]+)?)$'
+    pattern_retries = r'^--retries=([0-9]+)$'
+    pattern_retry_backoff = r'^--retry-backoff=([0-9]+(?:\.[0-9]+)?)$'
+    pattern_watch = r'^--watch(="?yes"?|="?no"?|="?poll"?)?$'
+    pattern_dedup = r'^--dedup(="?yes"?|="?no"?|="?copy"?)?$'
+    pattern_shared = r'^--shared(?:="?([A-Za-z0-9_.-]+)"?)?$'
+    pattern_lease_timeout = r'^--lease-timeout=([0-9]+(?:\.[0-9]+)?)$'
+
+    if len(argv) > 1:
+        interactive_mode = False  # Disabling interactive mode.
+
+        # If an input parameter has been passed, extracting valid values before running the script.
+        # Skipping the first parameter since it is the name of the script, and not an argument.
+        for argument in argv[1:]:
+            if match(pattern_root, argument):
+                root = search(pattern_root, argument).groups()[0]
+
+                if not isdir(root):
+                    # Force-stop if the path does not point to a valid directory.
+                    print(f'''
+                        Unexpected value for the root directory: `{root}`
 
                         Make sure that the path is valid and points to an existing directory
                     ''')
 
-                    sys_exit()
+                    sys_exit(exit_status_usage)
             elif match(pattern_force_write, argument):
                 # Extracting the pattern
                 force_write = search(pattern_force_write, argument).groups()
@@ -485,10 +4702,116 @@ if __name__ == '__main__':
                     force_write = True if force_write == 'yes' else False
                 else:
                     force_write = False
+            elif match(pattern_jobs, argument):
+                jobs = int(search(pattern_jobs, argument).groups()[0])
+
+                if jobs < 1:
+                    print(f'Number of jobs should be at least 1, got `{jobs}`')
+                    sys_exit(exit_status_usage)
+            elif match(pattern_jobs_range, argument):
+                min_jobs, jobs = map(int, search(pattern_jobs_range, argument).groups())
+
+                if min_jobs < 1 or jobs < min_jobs:
+                    print(f'Expected a range of jobs such as `2-8`, got `{min_jobs}-{jobs}`')
+                    sys_exit(exit_status_usage)
+            elif match(pattern_batch, argument):
+                batch_mode = search(pattern_batch, argument).groups()[0]
+                batch_mode = not batch_mode or batch_mode.strip('="') == 'yes'
+            elif match(pattern_report, argument):
+                report_file = search(pattern_report, argument).groups()[0]
+            elif match(pattern_resume, argument):
+                resume = search(pattern_resume, argument).groups()[0]
+                resume = not resume or resume.strip('="') == 'yes'
+            elif match(pattern_incremental, argument):
+                incremental = search(pattern_incremental, argument).groups()[0]
+                incremental = incremental.strip('="') if incremental else 'yes'
+                incremental = 'hash' if incremental == 'hash' else incremental == 'yes'
+            elif match(pattern_audio_tracks, argument):
+                audio_tracks = search(pattern_audio_tracks, argument).groups()[0]
+            elif match(pattern_segment, argument):
+                segment_threshold = float(search(pattern_segment, argument).groups()[0])
+            elif match(pattern_group, argument):
+                group_threshold = float(search(pattern_group, argument).groups()[0])
+            elif match(pattern_engine, argument):
+                engine = search(pattern_engine, argument).groups()[0]
+
+                if engine not in engines:
+                    print(f'Unexpected engine `{engine}`, allowed values: {", ".join(engines)}')
+                    sys_exit(exit_status_usage)
+            elif match(pattern_timeout, argument):
+                job_timeout = float(search(pattern_timeout, argument).groups()[0])
+            elif match(pattern_stall_timeout, argument):
+                stall_timeout = float(search(pattern_stall_timeout, argument).groups()[0])
+            elif match(pattern_retries, argument):
+                retry_count = int(search(pattern_retries, argument).groups()[0])
+            elif match(pattern_retry_backoff, argument):
+                retry_backoff = float(search(pattern_retry_backoff, argument).groups()[0])
+            elif match(pattern_watch, argument):
+                watch_mode = search(pattern_watch, argument).groups()[0]
+                watch_mode = watch_mode.strip('="') if watch_mode else 'yes'
+                watch_mode = 'poll' if watch_mode == 'poll' else watch_mode == 'yes'
+            elif match(pattern_dedup, argument):
+                dedup_mode = search(pattern_dedup, argument).groups()[0]
+                dedup_mode = dedup_mode.strip('="') if dedup_mode else 'yes'
+                dedup_mode = 'copy' if dedup_mode == 'copy' else dedup_mode == 'yes'
+            elif match(pattern_shared, argument):
+                shared_queue = search(pattern_shared, argument).groups()[0] or 'default'
+            elif match(pattern_lease_timeout, argument):
+                lease_timeout = float(search(pattern_lease_timeout, argument).groups()[0])
+
+                if lease_timeout <= 0:
+                    print(f'Lease timeout should be more than zero, got `{lease_timeout}`')
+                    sys_exit(exit_status_usage)
+            elif match(pattern_native, argument):
+                native = search(pattern_native, argument).groups()[0]
+                if native and native.strip('="') == 'no':
+                    native_files = set()
+            elif match(pattern_cache, argument):
+                metadata_cache = search(pattern_cache, argument).groups()[0]
+                metadata_cache = '' if metadata_cache == 'no' else metadata_cache
+            elif match(pattern_schedule, argument):
+                schedule_policy = search(pattern_schedule, argument).groups()[0]
+
+                if schedule_policy not in scheduling_policies:
+                    print(f'Unexpected scheduling policy `{schedule_policy}`, allowed values: '
+                          f'{", ".join(scheduling_policies)}')
+                    sys_exit(exit_status_usage)
             else:
                 # If an unexpected value is encountered, stop the script midway.
                 print(f'Unexpected argument `{argument}`')
-                sys_exit()
+                sys_exit(exit_status_usage)
+
+    if engine == 'async':
+        # Options relying on worker threads, the async engine would silently ignore them.
+        unsupported: List[str] = [option for option, used in [
+            ('--segment', segment_threshold > 0), ('--group', group_threshold > 0),
+            ('--jobs=MIN-MAX', 0 < min_jobs < jobs)] if used]
+
+        if unsupported:
+            print(f'{", ".join(unsupported)} can\'t be used with `--engine=async`')
+            sys_exit(exit_status_usage)
+
+        if soundfile is not None and native_files:
+            print('The in-process encoder is not used by `--engine=async`, wav files are converted '
+                  'by ffmpeg (pass `--native=no` to hide this warning)')
+
+    if watch_mode:
+        # Options of a batch, the watch mode would silently ignore them.
+        unsupported = [option for option, used in [
+            ('--resume', resume), ('--incremental', bool(incremental)),
+            ('--report', bool(report_file)), ('--dedup', bool(dedup_mode)),
+            ('--shared', bool(shared_queue))] if used]
+
+        if unsupported:
+            print(f'{", ".join(unsupported)} can\'t be used with `--watch`')
+            sys_exit(exit_status_usage)
+
+    interactive_mode = interactive_mode and not batch_mode
+
+    # Printing the welcome message at the start of the script - there is no one to welcome in
+    # batch mode.
+    if not batch_mode:
+        print(welcome_message)
 
     print(f'\nCurrent root directory is: `{root}`')
 
@@ -510,21 +4833,11 @@ if __name__ == '__main__':
             print(f'\n\nUsing "{root}" as the root directory.')
             break
 
-    # Getting a list of all the files that are present inside the root directory.
-    # This function will populate `files` which is a list of strings with each
-    # string being the full path of a file found inside the root directory.
-    get_file_list(root)
-
-    # Displaying brief info.
-    print(f'\n\nFound {len(files)} files in the directory.')
-
     if interactive_mode:
         # Asking if conflicting files are to be overwritten or not inside interactive mode.
         force_write: Union[bool, str, None] = None
-        while len(files) > 0:
-            # Infinite loop as long as files are found in the root directory. Will break out of this
-            # loop when user selects one a valid option. This check is to ensure that the user
-            # isn't asked to choose when no file could be found in the root directory.
+        while True:
+            # Infinite loop, will break out of this loop when user selects one a valid option.
             force_write = str(input('Force overwrite any file(s) in case of a conflict (yes/no)? '
                                     'Warning; This could lead to loss of data: ').strip()).lower()
 
@@ -535,19 +4848,159 @@ if __name__ == '__main__':
                 force_write = False
                 break
 
-    for i in range(len(files)):
-        print(f'\n({i + 1}/{len(files)}) Processing file: {path.basename(files[i])}')
+    if watch_mode:
+        # Converting the files as they land in the root directory, until the user hits Ctrl-C -
+        # there is no batch to be resumed, or summarized at the end.
+        exit_status: int = watch_directory(root, overwrite=force_write, worker_count=jobs)
 
-        result, file = generate_flac_file(files[i], overwrite=force_write)
-        if result:
-            # Once the flac file is created successfully, replacing the progress bar with a filled
-            # one, and time remaining as zero - without this, the progress bar will remain stuck
-            # near the end and another will be drawn for the next file - this might confuse some
-            # users into thinking that the process failed.
-            animated_progress(100, 100, 0)
+        if batch_mode:
+            sys_exit(exit_status)
+        animated_exit(exit_status)
 
-            # Finally printing the success message.
-            print(f'\n\tGenerated file "{file}" successfully')
+    # Generator yielding the full path of each file found inside the root directory. The files are
+    # converted as soon as they are found, while the rest of the directory is still being scanned.
+    batch_phases: Dict[str, float] = {}
+    sources: Iterable[str] = timed_sources(scan_files(root), batch_phases)
+
+    # State of each file as recorded by the interrupted batch, empty unless resuming.
+    journal, scanned = load_journal(root) if resume else ({}, False)
+    done: List[str] = [source for source, state in journal.items() if state == 'done']
+
+    if resume and not journal:
+        print('\nNo interrupted batch found, converting every file')
+    elif resume:
+        print(f'\nResuming the interrupted batch, {len(done)} of {len(journal)} files were '
+              f'converted already')
+
+        # The files left to be converted are taken from the journal if the interrupted batch had
+        # found all of them, the directory is scanned again otherwise.
+        sources = [source for source, state in journal.items() if state != 'done'] if scanned \
+            else (source for source in sources if journal.get(source) != 'done')
+
+    # Recording the state of each file as the batch moves along, in case it gets interrupted. With
+    # a shared queue, the processes would overwrite each other's journal - the queue itself keeps
+    # track of the files converted, and of the ones abandoned by a process that died.
+    if not shared_queue:
+        open_journal(root, done)
+    sources = journal_sources(sources)
+
+    # List of files skipped in incremental mode, populated while the sources are consumed.
+    skipped: List[str] = []
+    manifest: Dict[str, Dict] = {}
+
+    if incremental:
+        # Skipping the files that are already up to date without firing ffmpeg for them.
+        manifest = load_manifest(root)
+        sources = skip_up_to_date(root, sources, manifest, use_hash=incremental == 'hash',
+                                  skipped=skipped)
+
+    # Sources identical to an earlier source, mapped to that source - these are not converted.
+    duplicates: Dict[str, List[str]] = {}
+
+    if dedup_mode:
+        # Like scheduling, this waits for the directory to be scanned completely.
+        dedup_start: float = perf_counter()
+        sources = dedup_sources(sources, duplicates)
+        batch_phases['dedup'] = perf_counter() - dedup_start
+
+        print(f'\nFound {sum(map(len, duplicates.values()))} duplicates of '
+              f'{len(duplicates)} files in {print_time(int(batch_phases["dedup"]))}')
+
+    # Ordering the files as per the scheduling policy - unless the files are converted in the
+    # order they are found, this waits for the directory to be scanned completely.
+    sources, predicted = schedule_sources(sources, schedule_policy, jobs)
+    if predicted is not None:
+        print(f'\nPredicted runtime: {print_time(int(predicted))}')
+
+    # List of files converted by the other processes of the shared queue.
+    others: List[str] = []
+
+    if shared_queue:
+        # Each file is claimed as the pool picks it up, after scheduling - claiming the files while
+        # they are being ordered would leave nothing for the other processes.
+        try:
+            open_queue(root, shared_queue)
+        except OSError as error:
+            print(f'\nUnable to join the shared queue `{shared_queue}`: {error}')
+            sys_exit(exit_status_failed)
+
+        print(f'\nSharing the files with the other processes in queue `{shared_queue}` as '
+              f'`{worker_name}`')
+        sources = shared_sources(sources, others)
+
+    # Getting the start time of the batch, used to calculate the throughput at the end.
+    batch_start: float = time()
+
+    try:
+        if engine == 'async':
+            try:
+                results = asyncio.run(convert_files_async(sources, overwrite=force_write,
+                                                          worker_count=jobs))
+            except KeyboardInterrupt:
+                # The conversions still running have been cancelled, and their partial files
+                # removed.
+                print('\n\nConversion cancelled')
+                sys_exit(exit_status_failed)
+        else:
+            results = convert_files(sources, overwrite=force_write, worker_count=jobs)
+
+        # The time the duplicates would have taken to convert, less the time spent cloning them.
+        clones: List[ConversionResult] = materialize_duplicates(results, duplicates,
+                                                                overwrite=force_write)
+
+        if incremental:
+            # Saved before leaving the shared queue, the manifest is locked through the queue.
+            converted: List[str] = []
+            for result in results + clones:
+                if result.success:
+                    update_manifest(root, result.source, result.flac_files, manifest,
+                                    use_hash=incremental == 'hash')
+                    converted.append(result.source)
+
+            save_manifest(root, manifest, converted)
+    finally:
+        # Leaving the shared queue however the batch ends, the leases still held by this process
+        # can be claimed by the other processes straight away instead of having to expire.
+        close_queue()
+
+    seconds: Dict[str, float] = {duplicate: result.seconds for result in results
+                                 for duplicate in duplicates.get(result.source, [])}
+    saved: float = sum(seconds[clone.source] - clone.seconds for clone in clones if clone.success)
+    results += clones
+
+    batch_time: float = time() - batch_start
+
+    # The batch is over, there is nothing left to resume.
+    close_journal(root)
+
+    # Displaying brief info.
+    print(f'\n\nFound {len(results) + len(skipped) + len(done) + len(others)} files in the '
+          f'directory.')
+    print_summary(results, batch_time, skipped=len(skipped))
+
+    if others:
+        print(f'Skipped {len(others)} files converted by the processes in queue `{shared_queue}`')
+
+    if clones:
+        print(f'Cloned the flac files of {len(clones)} duplicates, saving about '
+              f'{round(max(saved, 0), 2)}s of encoding')
+
+    if predicted is not None:
+        print(f'Runtime: {print_time(int(batch_time))} (predicted {print_time(int(predicted))})')
+
+    records: List[Dict] = [file_record(result) for result in results]
+    run_summary: Dict = summarize_run(records, batch_phases.get('scan', 0.0))
+    print_run_summary(run_summary)
+
+    if report_file:
+        write_report(report_file, records, run_summary)
+
+    # Any file that failed to convert (or got ffmpeg stuck) fails the run, a scheduler chaining runs
+    # can tell from the exit status alone.
+    exit_status: int = exit_status_failed if any(result.failed for result in results) else 0
+
+    if batch_mode:
+        sys_exit(exit_status)
 
     # Displaying a nice little disappearing animation.
-    animated_exit()
+    animated_exit(exit_status)
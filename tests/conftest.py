@@ -0,0 +1,5 @@
+import sys
+from os import path
+
+# The script is not a package, making it importable from the tests.
+sys.path.insert(0, path.dirname(path.dirname(path.abspath(__file__))))
@@ -0,0 +1,28 @@
+import asyncio
+from time import perf_counter, sleep
+
+import GeneratorMain
+
+
+def test_blocking_sources_do_not_hold_up_conversions(monkeypatch):
+    events = []
+
+    def sources():
+        yield 'a.wav'
+        # Blocking the thread pulling the sources, like the scan or the shared queue would.
+        sleep(0.5)
+        events.append(('pulled b.wav', perf_counter()))
+        yield 'b.wav'
+
+    async def convert_file_async(source, *, overwrite=False):
+        await asyncio.sleep(0.05)
+        events.append((f'converted {source}', perf_counter()))
+        return GeneratorMain.ConversionResult(source, True, [], 1.0, 0.05)
+
+    monkeypatch.setattr(GeneratorMain, 'convert_file_async', convert_file_async)
+    monkeypatch.setattr(GeneratorMain, 'estimate_duration', lambda source: 1.0)
+
+    results = asyncio.run(GeneratorMain.convert_files_async(sources(), worker_count=2))
+
+    assert [result.source for result in results] == ['a.wav', 'b.wav']
+    assert [event for event, _ in events] == ['converted a.wav', 'pulled b.wav', 'converted b.wav']
@@ -0,0 +1,26 @@
+from os.path import join
+
+import GeneratorMain
+
+
+def test_stale_duplicates_are_cloned_again(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    source, duplicate = join(root, 'a.wav'), join(root, 'b.wav')
+    for file, content in [(source, b'wav'), (duplicate, b'wav'), (join(root, 'a.flac'), b'new'),
+                          (join(root, 'b.flac'), b'old')]:
+        with open(file, 'wb') as handle:
+            handle.write(content)
+
+    monkeypatch.setattr(GeneratorMain, 'stale_sources', {duplicate})
+    result = GeneratorMain.ConversionResult(source, True, [join(root, 'a.flac')], 1.0, 1.0)
+
+    clones = GeneratorMain.materialize_duplicates([result], {source: [duplicate]})
+
+    assert [(clone.source, clone.success) for clone in clones] == [(duplicate, True)]
+    with open(join(root, 'b.flac'), 'rb') as handle:
+        assert handle.read() == b'new'
+
+    # Up to date duplicates are left alone without `overwrite`.
+    monkeypatch.setattr(GeneratorMain, 'stale_sources', set())
+    clones = GeneratorMain.materialize_duplicates([result], {source: [duplicate]})
+    assert clones[0].skipped
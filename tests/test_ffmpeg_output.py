@@ -0,0 +1,28 @@
+import os
+import sys
+from os.path import join
+
+import GeneratorMain
+
+
+def test_progress_lines_are_split_on_newlines(tmp_path, monkeypatch):
+    # Stands in for ffmpeg, writing the progress stream with `\n` line endings.
+    script = join(str(tmp_path), 'ffmpeg.py')
+    with open(script, 'w') as file:
+        file.write('import sys\n'
+                   'for block in range(3):\n'
+                   '    sys.stdout.buffer.write(b"out_time_us=%d\\nprogress=%s\\n" % '
+                   '((block + 1) * 1000000, b"end" if block == 2 else b"continue"))\n')
+
+    monkeypatch.setattr(GeneratorMain, 'ffmpeg_command',
+                        lambda arguments: [sys.executable, script])
+    # `os.linesep` on Windows, where pexpect splits the lines returned by `readline` on `\r\n`.
+    monkeypatch.setattr(os, 'linesep', '\r\n')
+
+    progress = []
+    finished, _, _ = GeneratorMain.run_ffmpeg('', on_progress=lambda value, _: progress.append(
+        value.out_time))
+
+    assert finished
+    # The final block marks the conversion as finished, it is not reported as progress.
+    assert progress == [1.0, 2.0]
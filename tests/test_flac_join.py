@@ -0,0 +1,147 @@
+from os import urandom
+from os.path import join
+from shutil import which
+
+import pytest
+
+import GeneratorMain
+
+
+def test_crc16_shift_is_linear():
+    for length_a, length_b in [(0, 0), (1, 0), (0, 7), (5, 1), (17, 300), (1000, 4093)]:
+        a, b = urandom(length_a), urandom(length_b)
+        shifted = GeneratorMain.flac_crc16_shift(GeneratorMain.flac_crc16(a), len(b))
+        assert GeneratorMain.flac_crc16(a + b) == shifted ^ GeneratorMain.flac_crc16(b)
+
+
+@pytest.mark.parametrize('number', [0, 1, 0x7F, 0x80, 0x7FF, 0x800, 0xFFFF, 0x10000, 0x1FFFFF,
+                                    0x200000, 0x3FFFFFF, 0x4000000, (1 << 31) - 1])
+def test_frame_number_round_trip(number):
+    # Fixed block size of 4096 samples, 44.1 kHz, stereo, 16 bits per sample.
+    header = b'\xff\xf8\xc9\x18' + GeneratorMain.encode_frame_number(number)
+    header += bytes([GeneratorMain.flac_crc8(header)])
+
+    assert GeneratorMain.parse_frame_header(header + bytes(16), 0) == \
+        (number, len(header), len(header) - 5)
+
+
+@pytest.mark.parametrize('total_samples, count', [
+    (61 * 44100, 32), (44100, 16), (10 ** 6, 1), (GeneratorMain.segment_block_size, 4),
+    (1, 8), (3600 * 48000, 12)])
+def test_segment_layout_leaves_only_the_last_segment_short(total_samples, count):
+    length, segments = GeneratorMain.segment_layout(total_samples, count)
+
+    assert 1 <= segments <= count
+    assert length % GeneratorMain.segment_block_size == 0
+    # Every segment but the last one is full, and the last one is not empty.
+    assert (segments - 1) * length < total_samples <= segments * length
+
+
+def frames(data, position):
+    # Yields each frame of a fixed block size FLAC stream, the way `join_flac_segments` finds them.
+    header, number = GeneratorMain.parse_frame_header(data, position), 0
+    while header is not None:
+        end, following = position + header[1], None
+        while following is None:
+            end = data.find(b'\xff\xf8', end + 1)
+            if end == -1:
+                end = len(data)
+                break
+            following = GeneratorMain.parse_frame_header(data, end)
+            if following is not None and following[0] != number + 1:
+                following = None
+
+        yield header[0], data[position:end]
+        position, header, number = end, following, number + 1
+
+
+def test_join_segments_written_by_soundfile(tmp_path):
+    soundfile = pytest.importorskip('soundfile')
+    numpy = pytest.importorskip('numpy')
+
+    # 130 blocks in the first segment, the frame numbers of the following segments then take
+    # more than one byte.
+    block_size = 4096
+    lengths = [130 * block_size, 3 * block_size, 1000]
+    audio = numpy.random.default_rng(0).integers(-2000, 2000, (sum(lengths), 2), dtype='int16')
+
+    segments, start = [], 0
+    for index, length in enumerate(lengths):
+        segments.append(join(str(tmp_path), f'segment{index}.flac'))
+        soundfile.write(segments[-1], audio[start:start + length], 44100, subtype='PCM_16')
+        start += length
+
+    blocks, _ = GeneratorMain.read_flac_metadata(open(segments[0], 'rb').read())
+    if int.from_bytes(blocks[0][1][0:2], 'big') != block_size or \
+            int.from_bytes(blocks[0][1][2:4], 'big') != block_size:
+        pytest.skip('soundfile does not write a fixed block size of 4096 samples')
+
+    flac_file = join(str(tmp_path), 'joined.flac')
+    assert GeneratorMain.join_flac_segments(segments, flac_file) == 26
+
+    with open(flac_file, 'rb') as file:
+        data = file.read()
+
+    blocks, position = GeneratorMain.read_flac_metadata(data)
+    assert int.from_bytes(blocks[0][1][10:18], 'big') & ((1 << 36) - 1) == sum(lengths)
+    assert blocks[0][1][18:34] == bytes(16)
+
+    # Frames numbered in sequence, each with a valid CRC-16 - the CRC-16 of a whole frame,
+    # including its CRC, is zero.
+    numbers = []
+    for number, frame in frames(data, position):
+        numbers.append(number)
+        assert GeneratorMain.flac_crc16(frame) == 0
+    assert numbers == list(range(134))
+
+    decoded, sample_rate = soundfile.read(flac_file, dtype='int16')
+    assert sample_rate == 44100
+    assert numpy.array_equal(decoded, audio)
+
+
+def test_join_rejects_a_short_segment_before_the_last(tmp_path):
+    soundfile = pytest.importorskip('soundfile')
+    numpy = pytest.importorskip('numpy')
+
+    segments = []
+    for index, length in enumerate([4096 + 100, 4096]):
+        segments.append(join(str(tmp_path), f'segment{index}.flac'))
+        soundfile.write(segments[-1], numpy.zeros((length, 1), dtype='int16'), 44100,
+                        subtype='PCM_16')
+
+    with pytest.raises(ValueError):
+        GeneratorMain.join_flac_segments(segments, join(str(tmp_path), 'joined.flac'))
+
+
+def test_segments_only_use_idle_workers(tmp_path, monkeypatch):
+    info = GeneratorMain.MediaInfo(600.0, [GeneratorMain.AudioStream('', 'pcm_s16le', 44100, 'stereo')])
+    workers = GeneratorMain.Semaphore(0)
+    monkeypatch.setattr(GeneratorMain, 'jobs', 8)
+    monkeypatch.setattr(GeneratorMain, 'idle_workers', workers)
+
+    # No worker is idle, the file is converted in a single pass by the worker holding it.
+    assert GeneratorMain.generate_segmented_flac_file(
+        join(str(tmp_path), 'a.wav'), join(str(tmp_path), 'a.flac'), info) is None
+
+
+@pytest.mark.skipif(which('ffmpeg') is None, reason='ffmpeg is not installed')
+def test_segmented_encode_borrows_and_returns_idle_workers(tmp_path, monkeypatch):
+    soundfile = pytest.importorskip('soundfile')
+    numpy = pytest.importorskip('numpy')
+
+    source, flac_file = join(str(tmp_path), 'a.wav'), join(str(tmp_path), 'a.flac')
+    audio = numpy.random.default_rng(0).integers(-2000, 2000, (44100 * 10 + 123, 2), dtype='int16')
+    soundfile.write(source, audio, 44100, subtype='PCM_16')
+
+    workers = GeneratorMain.Semaphore(2)
+    monkeypatch.setattr(GeneratorMain, 'jobs', 8)
+    monkeypatch.setattr(GeneratorMain, 'idle_workers', workers)
+
+    info = GeneratorMain.probe_file(source)
+    assert GeneratorMain.generate_segmented_flac_file(source, flac_file, info,
+                                                      show_progress=False)[0]
+
+    # Both idle workers were handed back.
+    assert workers.acquire(blocking=False) and workers.acquire(blocking=False)
+    assert not workers.acquire(blocking=False)
+    assert numpy.array_equal(soundfile.read(flac_file, dtype='int16')[0], audio)
@@ -0,0 +1,48 @@
+from os.path import isfile, join
+from shutil import which
+
+import pytest
+
+import GeneratorMain
+
+
+@pytest.mark.skipif(which('ffmpeg') is None, reason='ffmpeg is not installed')
+def test_group_falls_back_to_a_single_file_when_saving_fails(tmp_path, monkeypatch):
+    soundfile = pytest.importorskip('soundfile')
+    numpy = pytest.importorskip('numpy')
+
+    sources = [join(str(tmp_path), f'{name}.wav') for name in ['a', 'b']]
+    for source in sources:
+        soundfile.write(source, numpy.zeros((44100, 2), dtype='int16'), 44100, subtype='PCM_16')
+
+    # Moving the first flac file of the group into place fails once.
+    failures = [join(str(tmp_path), 'a.flac')]
+    replace = GeneratorMain.replace
+
+    def failing_replace(source, target):
+        if target in failures:
+            failures.remove(target)
+            raise PermissionError(13, 'Permission denied', target)
+        replace(source, target)
+
+    class Board:
+        def __init__(self):
+            self.updates = {}
+
+        def update(self, source, position, duration):
+            self.updates[source] = (position, duration)
+
+    board = Board()
+    monkeypatch.setattr(GeneratorMain, 'replace', failing_replace)
+    monkeypatch.setattr(GeneratorMain, 'dashboard', board)
+
+    results = GeneratorMain.convert_group(sources)
+
+    assert [(result.source, result.success) for result in results] == \
+        [(source, True) for source in sources]
+    assert all(isfile(source[:-len('wav')] + 'flac') for source in sources)
+    assert not any(isfile(GeneratorMain.partial_path(source[:-len('wav')] + 'flac'))
+                   for source in sources)
+
+    # Both files of the group had their progress reported.
+    assert sorted(board.updates) == sorted(sources)
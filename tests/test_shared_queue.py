@@ -0,0 +1,54 @@
+import subprocess
+import sys
+from glob import glob
+from json import load
+from os import makedirs
+from os.path import dirname, isfile, join
+from shutil import which
+
+import pytest
+
+import GeneratorMain
+
+script = join(dirname(dirname(__file__)), 'GeneratorMain.py')
+
+
+@pytest.mark.skipif(which('ffmpeg') is None, reason='ffmpeg is not installed')
+@pytest.mark.parametrize('engine', GeneratorMain.engines)
+def test_processes_convert_each_file_once(tmp_path, engine):
+    soundfile = pytest.importorskip('soundfile')
+    numpy = pytest.importorskip('numpy')
+
+    root = str(tmp_path)
+    sources = []
+    for index in range(24):
+        directory = join(root, f'album{index % 4}', f'disc{index % 2}')
+        makedirs(directory, exist_ok=True)
+        sources.append(join(directory, f'track{index}.wav'))
+
+        samples = numpy.random.default_rng(index).integers(-2000, 2000, (22050, 2), dtype='int16')
+        soundfile.write(sources[-1], samples, 44100, subtype='PCM_16')
+
+    processes = [subprocess.Popen([sys.executable, script, '--batch', '--shared=test',
+                                   f'--engine={engine}', '--native=no', '--jobs=2',
+                                   '--incremental', '--lease-timeout=30', f'--root={root}'],
+                                  stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                 for _ in range(4)]
+
+    for process in processes:
+        output = process.communicate(timeout=300)[0].decode(errors='replace')
+        assert process.returncode == 0, output
+
+    queue = join(root, GeneratorMain.queue_dir_name, 'test')
+    states = [load(open(state)) for state in glob(join(queue, '*.state'))]
+
+    # Exactly one state per file - no file was converted by two processes - and no lease is left.
+    assert sorted(state['source'] for state in states) == sorted(sources)
+    assert all(state['state'] == 'done' for state in states)
+    assert glob(join(queue, '*.lease')) == []
+    assert all(isfile(source[:-len('wav')] + 'flac') for source in sources)
+
+    # Each process merged the files it converted into the manifest.
+    manifest = load(open(join(root, GeneratorMain.manifest_name)))
+    assert sorted(join(root, source) for source in manifest) == sorted(sources)
+    assert glob(join(root, GeneratorMain.manifest_name + '.*')) == []
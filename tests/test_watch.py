@@ -0,0 +1,37 @@
+from os import makedirs, utime
+from os.path import join
+from time import time
+
+import GeneratorMain
+
+
+def test_poll_skips_unchanged_directories(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    makedirs(join(root, 'a', 'b'))
+
+    # Modification times well in the past, recent directories are always read again.
+    for directory in [root, join(root, 'a'), join(root, 'a', 'b')]:
+        utime(directory, (time() - 60, time() - 60))
+
+    watcher = GeneratorMain.DirectoryWatcher(root, use_inotify=False)
+    assert all(modified is not None for modified in watcher.directories.values())
+
+    reads = []
+    original = GeneratorMain.DirectoryWatcher.read_directory
+
+    def read_directory(self, directory):
+        reads.append(directory)
+        return original(self, directory)
+
+    monkeypatch.setattr(GeneratorMain.DirectoryWatcher, 'read_directory', read_directory)
+
+    for _ in range(3):
+        watcher.poll()
+    assert reads == []
+
+    # A new file changes the modification time of its directory, only that directory is read.
+    open(join(root, 'a', 'new.wav'), 'wb').close()
+    watcher.poll()
+
+    assert reads == [join(root, 'a')]
+    assert join(root, 'a', 'new.wav') in watcher.pending